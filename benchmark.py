@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark for the quiz solver
+
+Starts the mock quiz server and the real FastAPI app in-process, replaces the
+Groq client with a stub, drives POST /quiz and reports per-stage latency
+percentiles, throughput and memory. Runs fully offline:
+
+    python benchmark.py --chains 20 --concurrency 5 --chain-length 5
+    python benchmark.py --js-ratio 0.5 --llm-latency-ms 300 --max-p95 10
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import argparse
+import resource
+import contextlib
+from functools import wraps
+
+# main.py refuses to import without these; the benchmark never uses real credentials
+os.environ.setdefault("GROQ_API_KEY", "benchmark-stub")
+os.environ.setdefault("STUDENT_EMAIL", "bench@example.com")
+os.environ.setdefault("STUDENT_SECRET", "bench-secret")
+
+import httpx
+import uvicorn
+
+import main
+import mock_quiz_server
+from llm_cache import LLMCache
+from llm_limiter import LLMRateLimiter
+
+STAGES = ["fetch_quiz_page", "extract_quiz_instruction", "solve_quiz", "parse_answer", "submit_answer"]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def instrument_stages(timings: dict):
+    """Wrap main's stage functions so every call records its duration"""
+    for name in STAGES:
+        original = getattr(main, name)
+        samples = timings.setdefault(name, [])
+
+        if inspect.iscoroutinefunction(original):
+            async def timed(*args, _original=original, _samples=samples, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await _original(*args, **kwargs)
+                finally:
+                    _samples.append(time.perf_counter() - start)
+        else:
+            def timed(*args, _original=original, _samples=samples, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return _original(*args, **kwargs)
+                finally:
+                    _samples.append(time.perf_counter() - start)
+
+        setattr(main, name, wraps(original)(timed))
+
+
+async def serve(app, port: int):
+    """Run an ASGI app with uvicorn inside the current event loop"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def run_chain(client: httpx.AsyncClient, api_base: str, quiz_url: str) -> tuple:
+    """Submit one quiz chain and follow it to completion"""
+    start = time.perf_counter()
+    response = await client.post(f"{api_base}/quiz", json={
+        "email": os.environ["STUDENT_EMAIL"],
+        "secret": os.environ["STUDENT_SECRET"],
+        "url": quiz_url,
+    })
+    response.raise_for_status()
+    task_id = response.json()["task_id"]
+
+    since = 0
+    while True:
+        await asyncio.sleep(0.05)
+        status = (await client.get(f"{api_base}/quiz/status/{task_id}", params={"since": since})).json()
+        since = status["next"]
+        if status["status"] != "processing":
+            return time.perf_counter() - start, status["status"]
+
+
+async def run_benchmark(args) -> dict:
+    timings = {}
+    instrument_stages(timings)
+
+    main.solver.client = mock_quiz_server.StubLLMClient(args.llm_latency_ms, args.llm_wrong_rate, args.rows)
+    main.solver.async_client = mock_quiz_server.AsyncStubLLMClient(args.llm_latency_ms, args.llm_wrong_rate, args.rows)
+    # The stub has no provider limits unless asked to mimic one
+    stub_limit = {"rpm": args.llm_rpm} if args.llm_rpm else None
+    main.solver.rate_limiter = LLMRateLimiter(limits={}, default=stub_limit)
+    if not args.llm_cache:
+        # Chains repeat the same questions, so a warm cache would hide the LLM stage
+        main.solver.cache = LLMCache(max_entries=0, db_path="")
+
+    quiz_app = mock_quiz_server.create_app(
+        chain_length=args.chain_length,
+        js_ratio=args.js_ratio,
+        base64_ratio=args.base64_ratio,
+        pdf_ratio=args.pdf_ratio,
+        latency_ms=args.latency_ms,
+        failure_rate=args.failure_rate,
+        rows=args.rows,
+    )
+    quiz_server, quiz_task = await serve(quiz_app, args.quiz_port)
+    api_server, api_task = await serve(main.app, args.api_port)
+
+    quiz_url = f"http://127.0.0.1:{args.quiz_port}/quiz/1"
+    api_base = f"http://127.0.0.1:{args.api_port}"
+    limit = asyncio.Semaphore(args.concurrency)
+    chain_times, outcomes = [], {}
+
+    async def one(client):
+        async with limit:
+            elapsed, status = await run_chain(client, api_base, quiz_url)
+            chain_times.append(elapsed)
+            outcomes[status] = outcomes.get(status, 0) + 1
+
+    try:
+        async with httpx.AsyncClient(timeout=600) as client:
+            wall_start = time.perf_counter()
+            await asyncio.gather(*(one(client) for _ in range(args.chains)))
+            wall = time.perf_counter() - wall_start
+    finally:
+        api_server.should_exit = True
+        quiz_server.should_exit = True
+        await asyncio.gather(api_task, quiz_task)
+
+    def summary(samples: list) -> dict:
+        return {
+            "count": len(samples),
+            "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95),
+            "p99": percentile(samples, 99),
+        }
+
+    return {
+        "settings": vars(args),
+        "chains": summary(chain_times),
+        "stages": {name: summary(timings.get(name, [])) for name in STAGES},
+        "outcomes": outcomes,
+        "throughput_chains_per_s": args.chains / wall if wall else 0.0,
+        "hops_per_s": len(timings.get("submit_answer", [])) / wall if wall else 0.0,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def print_report(report: dict):
+    print(f"{'stage':<26}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = [("chain (end to end)", report["chains"])] + list(report["stages"].items())
+    for name, stats in rows:
+        print(f"{name:<26}{stats['count']:>7}"
+              f"{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}")
+    print()
+    print(f"Outcomes:   {report['outcomes']}")
+    print(f"Throughput: {report['throughput_chains_per_s']:.2f} chains/s, {report['hops_per_s']:.2f} hops/s")
+    print(f"Max RSS:    {report['max_rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the quiz solver against the mock quiz server")
+    parser.add_argument("--chains", type=int, default=10, help="quiz chains to run")
+    parser.add_argument("--concurrency", type=int, default=2, help="chains in flight at once")
+    parser.add_argument("--chain-length", type=int, default=5)
+    parser.add_argument("--js-ratio", type=float, default=0.0)
+    parser.add_argument("--base64-ratio", type=float, default=0.5)
+    parser.add_argument("--pdf-ratio", type=float, default=0.3)
+    parser.add_argument("--latency-ms", type=float, default=0, help="mock server latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="mock server HTTP 500 rate")
+    parser.add_argument("--rows", type=int, default=200, help="rows per attachment")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="stub LLM latency")
+    parser.add_argument("--llm-wrong-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rpm", type=float, default=0, help="client-side LLM requests/min limit (0: none)")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--quiz-port", type=int, default=8765)
+    parser.add_argument("--api-port", type=int, default=8766)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-p95", type=float, help="exit non-zero if chain p95 exceeds this many seconds")
+    parser.add_argument("--verbose", action="store_true", help="show the solver's own output")
+    args = parser.parse_args()
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        report = asyncio.run(run_benchmark(args))
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_p95 is not None and report["chains"]["p95"] > args.max_p95:
+        print(f"FAIL: chain p95 {report['chains']['p95']:.2f}s exceeds {args.max_p95:.2f}s")
+        sys.exit(1)
@@ -0,0 +1,203 @@
+"""
+Persistent headless Chromium pool for rendering quiz pages
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+from playwright.async_api import async_playwright
+
+import config
+import metrics
+
+
+class BrowserPool:
+    """Long-lived Chromium instance handing out isolated browser contexts"""
+
+    def __init__(self, max_contexts: int = config.BROWSER_POOL_SIZE,
+                 recycle_after: int = config.BROWSER_RECYCLE_PAGES,
+                 headless: bool = config.BROWSER_HEADLESS):
+        self.max_contexts = max_contexts
+        self.recycle_after = recycle_after
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._pages_served = 0
+        self._active: Dict[Any, int] = {}
+        self._semaphore = asyncio.Semaphore(max_contexts)
+        self._lock = asyncio.Lock()
+        self._spare = None  # (browser, context) opened ahead of time by warm(), holding a slot
+        self._waiting = 0  # context() calls queued for a slot
+
+    async def start(self):
+        """Start Playwright and launch the shared browser"""
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            if self._browser is None:
+                await self._launch()
+
+    async def stop(self):
+        """Close every browser and stop Playwright"""
+        if self._spare is not None:
+            self._spare = None  # closed along with its browser below
+            self._semaphore.release()
+        async with self._lock:
+            browsers = list(self._active.keys())
+            if self._browser is not None and self._browser not in self._active:
+                browsers.append(self._browser)
+            for browser in browsers:
+                await self._close_browser(browser)
+            self._active.clear()
+            self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _launch(self):
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._pages_served = 0
+
+    async def _close_browser(self, browser):
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"Error closing browser: {e}")
+
+    def _is_healthy(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _checkout(self):
+        """Return a healthy browser, recycling the current one if it is worn out"""
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+
+            if self._browser is not None and (
+                not self._is_healthy() or self._pages_served >= self.recycle_after
+            ):
+                retired = self._browser
+                self._browser = None
+                # Contexts still open on the retired browser close it on check-in
+                if self._active.get(retired, 0) == 0:
+                    self._active.pop(retired, None)
+                    await self._close_browser(retired)
+
+            if self._browser is None:
+                await self._launch()
+
+            browser = self._browser
+            self._pages_served += 1
+            self._active[browser] = self._active.get(browser, 0) + 1
+            return browser
+
+    async def _checkin(self, browser):
+        async with self._lock:
+            remaining = self._active.get(browser, 1) - 1
+            if remaining > 0:
+                self._active[browser] = remaining
+                return
+            self._active.pop(browser, None)
+            if browser is not self._browser:
+                await self._close_browser(browser)
+
+    async def _close(self, browser, context):
+        if context is not None:
+            try:
+                await context.close()
+            except Exception as e:
+                print(f"Error closing browser context: {e}")
+        await self._checkin(browser)
+
+    async def _release(self, browser, context):
+        await self._close(browser, context)
+        self._semaphore.release()
+
+    async def warm(self):
+        """Open a spare context ahead of the next render (e.g. while the LLM is
+        busy), launching or recycling the browser now rather than on demand.
+        Does nothing if a spare exists or the pool is fully checked out.
+
+        The spare holds one of the max_contexts slots and hands it over with
+        the context; context() closes it when a caller needs the slot instead.
+        """
+        if self._spare is not None or self._semaphore.locked():
+            return
+        await self._semaphore.acquire()
+        try:
+            browser = await self._checkout()
+        except Exception:
+            self._semaphore.release()
+            raise
+        try:
+            context = await browser.new_context()
+        except Exception:
+            await self._release(browser, None)
+            raise
+        if self._spare is not None or self._waiting:
+            # Another spare won, or a caller queued for the slot meanwhile
+            await self._release(browser, context)
+            return
+        self._spare = (browser, context)
+
+    async def _take_spare(self):
+        """The warmed (browser, context) and its slot if it is still usable,
+        else None (a dead spare is closed and its slot freed)"""
+        spare, self._spare = self._spare, None
+        if spare is None:
+            return None
+        browser, context = spare
+        if browser.is_connected():
+            return spare
+        await self._release(browser, context)
+        return None
+
+    async def _acquire(self):
+        """Wait for a slot, first freeing the one an idle spare holds if the pool is full"""
+        if self._spare is not None and self._semaphore.locked():
+            browser, context = self._spare
+            self._spare = None
+            await self._release(browser, context)
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Yield an isolated BrowserContext, limited to max_contexts at once.
+
+        A context opened by warm() is handed out first, with its slot, when
+        no options are given.
+        """
+        spare = None if context_options else await self._take_spare()
+        if spare is not None:
+            browser, context = spare
+        else:
+            await self._acquire()
+            try:
+                browser, context = await self._checkout(), None
+            except Exception:
+                self._semaphore.release()
+                raise
+        try:
+            if context is None:
+                context = await browser.new_context(**context_options)
+            yield context
+        finally:
+            await self._release(browser, context)
+
+    def stats(self) -> dict:
+        """Current pool usage"""
+        return {
+            "running": self._is_healthy(),
+            "active_contexts": sum(self._active.values()),
+            "max_contexts": self.max_contexts,
+            "pages_served": self._pages_served,
+            "spare_context": self._spare is not None,
+        }
+
+
+browser_pool = BrowserPool()
+metrics.BROWSER_CONTEXTS.set_function(lambda: browser_pool.stats()["active_contexts"])
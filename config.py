@@ -3,6 +3,7 @@ Configuration settings for the quiz solver
 """
 
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,7 +14,19 @@ STUDENT_SECRET = os.getenv("STUDENT_SECRET", "")
 
 # API Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
-GROQ_MODEL = "mixtral-8x7b-32768"
+GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")  # default model; the only one with a 32k window
+FAST_MODEL = os.getenv("FAST_MODEL", "llama3-8b-8192")  # lookups and simple arithmetic
+STRONG_MODEL = os.getenv("STRONG_MODEL", "llama3-70b-8192")  # reasoning, and retries of rejected answers
+MODEL_CONTEXT_TOKENS = {"mixtral-8x7b-32768": 32768, "llama3-8b-8192": 8192, "llama3-70b-8192": 8192}
+MODEL_DEFAULT_CONTEXT_TOKENS = 8192  # models not listed above
+# Question class -> model and reply size (see model_router)
+MODEL_ROUTES = {
+    "extraction": {"model": FAST_MODEL, "max_tokens": 256},
+    "arithmetic": {"model": FAST_MODEL, "max_tokens": 512},
+    "reasoning": {"model": STRONG_MODEL, "max_tokens": 2048},
+    "long_context": {"model": GROQ_MODEL, "max_tokens": 2048},
+}
+ROUTER_ESCALATE = os.getenv("ROUTER_ESCALATE", "True").lower() == "true"  # resubmit once on the strong model
 
 # Server Configuration
 HOST = os.getenv("HOST", "127.0.0.1")
@@ -23,12 +36,94 @@ DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 # Quiz Processing
 QUIZ_TIMEOUT_SECONDS = 180  # 3 minutes
 MAX_QUIZ_ATTEMPTS = 10
+# Per-stage caps and the minimum time each stage needs when reserving room for it
+STAGE_TIMEOUTS = {"fetch": 30, "extract": 5, "solve": 60, "parse": 5, "submit": 15}
+STAGE_RESERVE_SECONDS = {"fetch": 5, "extract": 0, "solve": 5, "parse": 0, "submit": 5}
+MIN_SOLVE_SECONDS = 10  # below this, a best-effort answer is submitted without solving
+PIPELINE_PREFETCH = os.getenv("PIPELINE_PREFETCH", "True").lower() == "true"  # fetch the next page as soon as its URL is known
+PIPELINE_WARM = os.getenv("PIPELINE_WARM", "True").lower() == "true"  # warm connections/browser during the LLM call
+RATE_LIMIT_MIN_INTERVAL = 0.0  # seconds between hops to the same host
+RATE_LIMIT_MAX_INTERVAL = 10.0
 BROWSER_HEADLESS = True
 BROWSER_TIMEOUT = 30000  # 30 seconds in ms
+HTTP_FETCH_TIMEOUT = 10  # seconds for the plain-HTTP fast path
+BROWSER_BLOCKED_RESOURCES = os.getenv(
+    "BROWSER_BLOCKED_RESOURCES", "image,media,font,stylesheet"
+).split(",")
+BROWSER_BLOCK_THIRD_PARTY = os.getenv("BROWSER_BLOCK_THIRD_PARTY", "True").lower() == "true"
+BROWSER_THIRD_PARTY_ALLOWLIST = os.getenv(
+    "BROWSER_THIRD_PARTY_ALLOWLIST", "cdn.jsdelivr.net,cdnjs.cloudflare.com,unpkg.com"
+).split(",")
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "4"))  # concurrent contexts
+BROWSER_RECYCLE_PAGES = int(os.getenv("BROWSER_RECYCLE_PAGES", "100"))  # relaunch after N pages
+
+# Task Store
+TASK_STORE_BACKEND = os.getenv("TASK_STORE_BACKEND", "memory")  # memory or sqlite
+TASK_STORE_DB = os.getenv("TASK_STORE_DB", "tasks.db")
+TASK_TTL_SECONDS = int(os.getenv("TASK_TTL_SECONDS", "3600"))
+TASK_MAX_ENTRIES = int(os.getenv("TASK_MAX_ENTRIES", "1000"))
+TASK_LOG_LINES = int(os.getenv("TASK_LOG_LINES", "500"))  # per-task ring buffer
+TASK_STORE_COMMIT_SECONDS = 1.0  # SQLite backend: how often pending writes are committed
+
+# Tracing
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))  # share of tasks traced
+TRACE_MAX_SPANS = 500  # per task
+
+# HTTP Client
+HTTP_TIMEOUT = 30  # seconds
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "10"))
+HTTP_KEEPALIVE_SECONDS = 60
+
+# File Downloads
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+DOWNLOAD_SPOOL_BYTES = 8 * 1024 * 1024  # kept in memory below this, spilled to disk above
+DOWNLOAD_TIMEOUT_SECONDS = 60  # whole transfer, not per read
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", "")  # e.g. .cache/downloads; empty disables
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# PDF Extraction
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = 8  # pages extracted per worker job
+
+# CSV Ingestion
+CSV_SAMPLE_BYTES = 256 * 1024  # sniffed for encoding, delimiter, dtypes and the plan prompt
+CSV_CHUNK_THRESHOLD = int(os.getenv("CSV_CHUNK_THRESHOLD", str(64 * 1024 * 1024)))  # chunked above this size
+CSV_CHUNK_ROWS = 200_000
+CSV_USE_PYARROW = os.getenv("CSV_USE_PYARROW", "True").lower() == "true"  # when pyarrow is installed
 
 # LLM Configuration
 LLM_MAX_TOKENS = 2048
 LLM_TEMPERATURE = 0.7
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "24000"))  # prompt + reply; each model's window caps it further
+# Free-form answers are voted on by several differently sampled candidates
+CONSENSUS_CANDIDATES = int(os.getenv("CONSENSUS_CANDIDATES", "1"))  # 1 disables voting; e.g. 3 to enable
+CONSENSUS_QUORUM = int(os.getenv("CONSENSUS_QUORUM", "2"))  # stop as soon as this many agree
+CONSENSUS_TEMPERATURES = [0.0, 0.4, 0.8]  # cycled across candidates
+CONSENSUS_MODELS = [m for m in os.getenv("CONSENSUS_MODELS", "").split(",") if m]  # cycled; empty uses the routed model
+# A slow LLM call is duplicated once it passes the model's observed latency percentile
+LLM_HEDGE = os.getenv("LLM_HEDGE", "True").lower() == "true"
+LLM_HEDGE_PERCENTILE = 90
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))  # hedges per request, at most
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL", "")  # model for the duplicate; empty uses the same one
+LLM_HEDGE_MIN_SAMPLES = 20  # calls observed before hedging starts
+LLM_HEDGE_WINDOW = 200  # recent calls the percentile is taken over
+# Provider rate limits per model, enforced client-side (see llm_limiter); LLM_RATE_LIMITS
+# takes JSON overrides, e.g. {"llama3-8b-8192": {"rpm": 30, "tpm": 30000}}
+LLM_RATE_LIMITS = {
+    "mixtral-8x7b-32768": {"rpm": 30, "tpm": 5000},
+    "llama3-8b-8192": {"rpm": 30, "tpm": 30000},
+    "llama3-70b-8192": {"rpm": 30, "tpm": 6000},
+}
+LLM_RATE_LIMITS.update(json.loads(os.getenv("LLM_RATE_LIMITS", "{}")))
+LLM_DEFAULT_RATE_LIMIT = {"rpm": 30, "tpm": 6000}  # models not listed above
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))  # concurrent calls across all chains
+LLM_TIMEOUT_SECONDS = 60  # per call, further capped by the chain deadline
+LLM_THREAD_POOL_SIZE = 4  # only used when the async Groq client is unavailable
+LLM_CACHE_SIZE = 512  # in-memory responses
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")  # SQLite path; empty disables the disk tier
+LLM_CACHE_DB_MAX_ENTRIES = 10000
 
 # Validation
 REQUIRED_VARS = ["STUDENT_EMAIL", "STUDENT_SECRET", "GROQ_API_KEY"]
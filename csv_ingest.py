@@ -0,0 +1,197 @@
+"""
+Bounded-memory CSV ingestion for large attachments
+
+A sample from the start of the file is sniffed for encoding, delimiter and
+column types, and the query plan decides which columns are read at all.
+Files above CSV_CHUNK_THRESHOLD are read in chunks and aggregated
+incrementally, so peak memory follows the chunk size, not the file size.
+"""
+
+import io
+import csv
+from typing import Any, BinaryIO, List, Optional
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+import config
+import query_engine
+
+ENCODINGS = ("utf-8", "latin-1")
+DELIMITERS = ",;\t|"
+# Aggregates that can be computed from per-chunk sum/count/min/max
+DECOMPOSABLE = {"sum", "count", "min", "max", "mean"}
+PARTIAL_COMBINE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def _decode(sample: bytes, truncated: bool) -> tuple:
+    """(encoding, text) for a sample, trimmed to whole lines if it was cut short"""
+    if sample.startswith(b"\xef\xbb\xbf"):
+        encoding, sample = "utf-8-sig", sample[3:]
+    else:
+        encoding = None
+    if truncated and b"\n" in sample:
+        sample = sample[:sample.rindex(b"\n") + 1]
+    for candidate in ([encoding] if encoding else ENCODINGS):
+        try:
+            return candidate, sample.decode("utf-8" if candidate == "utf-8-sig" else candidate)
+        except UnicodeDecodeError:
+            continue
+    return "latin-1", sample.decode("latin-1")
+
+
+def _sniff_dtypes(df: pd.DataFrame) -> dict:
+    """Compact dtypes for the columns of a sample: low-cardinality text as
+    category, numbers as int64/float64 (float64 when the sample has gaps)"""
+    dtypes = {}
+    for name, column in df.items():
+        if pd.api.types.is_integer_dtype(column):
+            dtypes[name] = "int64"
+        elif pd.api.types.is_float_dtype(column):
+            dtypes[name] = "float64"
+        elif pd.api.types.is_string_dtype(column) and len(column) >= 20 and column.nunique() <= len(column) // 2:
+            dtypes[name] = "category"
+    return dtypes
+
+
+def sniff(source: BinaryIO) -> Optional[dict]:
+    """Read a sample and describe the file, or None if it has no rows.
+
+    Returns encoding, sep, dtypes, the sample DataFrame, the total size in
+    bytes and an estimated row count.
+    """
+    source.seek(0, io.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    encoding, text = _decode(source.read(config.CSV_SAMPLE_BYTES), size > config.CSV_SAMPLE_BYTES)
+    source.seek(0)
+    if not text.strip():
+        return None
+    try:
+        sep = csv.Sniffer().sniff("\n".join(text.split("\n")[:20]), delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        sep = ","
+    sample = pd.read_csv(io.StringIO(text), sep=sep)
+    if sample.empty:
+        return None
+    sample_bytes = len(text.encode(encoding))
+    rows = len(sample) if sample_bytes >= size else int(size / sample_bytes * len(sample))
+    return {
+        "encoding": encoding, "sep": sep, "dtypes": _sniff_dtypes(sample),
+        "sample": sample, "size": size, "rows": rows,
+    }
+
+
+def _read(source: BinaryIO, info: dict, usecols: Optional[List[str]], typed: bool,
+          chunksize: Optional[int] = None):
+    kwargs = {"sep": info["sep"], "encoding": info["encoding"], "usecols": usecols}
+    if typed:
+        kwargs["dtype"] = {
+            name: dtype for name, dtype in info["dtypes"].items()
+            if usecols is None or name in usecols
+        }
+    if chunksize:
+        kwargs["chunksize"] = chunksize
+    elif config.CSV_USE_PYARROW and pyarrow is not None:
+        kwargs["engine"] = "pyarrow"
+    source.seek(0)
+    return pd.read_csv(source, **kwargs)
+
+
+def read_frame(source: BinaryIO, info: dict, usecols: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read the whole file (or just `usecols`) with the sniffed dtypes.
+
+    The dtypes come from a sample, so a later row can contradict them; the
+    read is then retried with pandas' own inference.
+    """
+    try:
+        return _read(source, info, usecols, typed=True)
+    except (ValueError, TypeError) as e:
+        print(f"Sniffed CSV dtypes did not fit, re-reading untyped: {e}")
+        return _read(source, info, usecols, typed=False)
+
+
+def _chunks(source: BinaryIO, info: dict, usecols: Optional[List[str]]):
+    """Yield chunks of CSV_CHUNK_ROWS rows, dropping the sniffed dtypes if they fail"""
+    done = 0
+    try:
+        for chunk in _read(source, info, usecols, typed=True, chunksize=config.CSV_CHUNK_ROWS):
+            done += 1
+            yield chunk
+        return
+    except (ValueError, TypeError) as e:
+        print(f"Sniffed CSV dtypes did not fit, re-reading untyped: {e}")
+    for index, chunk in enumerate(_read(source, info, usecols, typed=False,
+                                        chunksize=config.CSV_CHUNK_ROWS)):
+        if index >= done:
+            yield chunk
+
+
+def _needed_columns(info: dict, plan: dict) -> Optional[List[str]]:
+    """Actual column names the plan needs, or None when it returns whole rows"""
+    if not (plan.get("aggregate") or plan.get("group_by") or plan.get("select")):
+        return None
+    names = query_engine.resolve_columns(info["sample"], query_engine.plan_columns(plan))
+    # A bare row count still needs one column to read
+    return names or [info["sample"].columns[0]]
+
+
+def _partial(chunk: pd.DataFrame, plan: dict) -> pd.DataFrame:
+    """sum/count/min/max of the aggregate column in one filtered chunk, per group"""
+    chunk = query_engine.apply_filters(chunk, plan)
+    group_by = [query_engine._column(chunk, c) for c in plan.get("group_by") or []]
+    aggregate = plan.get("aggregate") or {}
+    target = aggregate.get("column")
+    if target in (None, "*"):
+        series = pd.Series(1, index=chunk.index)
+    else:
+        series = chunk[query_engine._column(chunk, target)]
+        if aggregate.get("func") == "count":
+            # Only non-null-ness matters; avoid summing or ordering text
+            series = pd.Series(1, index=chunk.index).where(series.notna())
+        elif not pd.api.types.is_numeric_dtype(series):
+            series = pd.to_numeric(series, errors="coerce")
+    stats = ["sum", "count", "min", "max"]
+    if group_by:
+        return series.groupby([chunk[c] for c in group_by], observed=True).agg(stats)
+    return series.agg(stats).to_frame().T
+
+
+def _aggregate_chunks(chunks, plan: dict) -> Any:
+    """Combine per-chunk partial aggregates into the plan's result"""
+    group_by = plan.get("group_by") or []
+    aggregate = plan.get("aggregate")
+    func = aggregate.get("func", "sum") if aggregate else "count"
+    partials = [_partial(chunk, plan) for chunk in chunks]
+    combined = pd.concat(partials)
+    if group_by:
+        combined = combined.groupby(level=list(range(len(group_by)))).agg(PARTIAL_COMBINE)
+    else:
+        combined = combined.agg(PARTIAL_COMBINE)
+    if func == "mean":
+        result = combined["sum"] / combined["count"]
+    else:
+        result = combined[func]
+    return query_engine.shape_result(result, plan)
+
+
+def run_plan(source: BinaryIO, info: dict, plan: dict) -> Any:
+    """Execute a query plan against a CSV file, reading only what it needs.
+
+    Small files are read whole. Above CSV_CHUNK_THRESHOLD, decomposable
+    aggregates (sum/count/min/max/mean) are combined chunk by chunk; other
+    plans keep only each chunk's filtered rows before running the plan.
+    """
+    usecols = _needed_columns(info, plan)
+    if info["size"] <= config.CSV_CHUNK_THRESHOLD:
+        return query_engine.execute_plan(read_frame(source, info, usecols), plan)
+
+    aggregate = plan.get("aggregate")
+    decomposable = (aggregate.get("func", "sum") in DECOMPOSABLE) if aggregate else bool(plan.get("group_by"))
+    if decomposable:
+        return _aggregate_chunks(_chunks(source, info, usecols), plan)
+    filtered = [query_engine.apply_filters(chunk, plan) for chunk in _chunks(source, info, usecols)]
+    return query_engine.execute_plan(pd.concat(filtered, ignore_index=True), plan)
@@ -0,0 +1,272 @@
+"""
+Format detection and typed loaders for quiz attachments
+
+Attachments are identified by magic bytes first, then Content-Type and file
+extension, then a look at the leading text. Zip and gzip archives are
+unwrapped into their members. Each file becomes a Dataset that is parsed
+only when its value is first used.
+"""
+
+import io
+import os
+import csv
+import gzip
+import json
+import zipfile
+import tempfile
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+import pandas as pd
+
+import config
+import csv_ingest
+
+MAGIC = [
+    (b"%PDF", "pdf"),
+    (b"PAR1", "parquet"),
+    (b"\x1f\x8b", "gzip"),
+    (b"PK\x03\x04", "zip"),
+]
+EXTENSIONS = {
+    ".csv": "csv", ".tsv": "csv",
+    ".json": "json", ".jsonl": "ndjson", ".ndjson": "ndjson",
+    ".xlsx": "xlsx", ".parquet": "parquet",
+    ".html": "html", ".htm": "html",
+    ".zip": "zip", ".gz": "gzip", ".pdf": "pdf",
+}
+CONTENT_TYPES = {
+    "text/csv": "csv", "text/tab-separated-values": "csv",
+    "application/json": "json", "application/x-ndjson": "ndjson",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "text/html": "html", "application/zip": "zip", "application/gzip": "gzip",
+    "application/pdf": "pdf",
+}
+MAX_ARCHIVE_DEPTH = 3
+
+LOADERS: Dict[str, Callable[[BinaryIO], Any]] = {}
+
+
+def register(fmt: str):
+    """Register a loader: a function from a seekable binary stream to a
+    DataFrame, a structured object, or None"""
+    def decorator(func):
+        LOADERS[fmt] = func
+        return func
+    return decorator
+
+
+def is_data_link(path: str) -> bool:
+    """Whether a link points at a file with a known data extension"""
+    path = path.lower()
+    return any(path.endswith(ext) for ext in EXTENSIONS)
+
+
+def may_be_data_link(path: str) -> bool:
+    """Whether a link has no extension at all, so only its Content-Type
+    (see is_data_content_type) can tell whether it serves data"""
+    name = path.rsplit("/", 1)[-1]
+    return bool(name) and "." not in name
+
+
+def is_data_content_type(content_type: str) -> bool:
+    """Whether a Content-Type is a data format worth downloading. HTML is
+    left out: behind an extensionless link it is almost always a page."""
+    mime = content_type.split(";")[0].strip().lower()
+    return mime == "application/octet-stream" or CONTENT_TYPES.get(mime, "html") != "html"
+
+
+def _extension_format(name: str) -> Optional[str]:
+    return EXTENSIONS.get(os.path.splitext(name.lower())[1])
+
+
+def _sniff_text(head: bytes) -> Optional[str]:
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if text.startswith(b"{"):
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        if len(lines) > 1 and lines[0].endswith(b"}") and lines[1].startswith(b"{"):
+            return "ndjson"
+        return "json"
+    if text.startswith(b"["):
+        return "json"
+    if text.startswith(b"<") and b"<table" in head.lower():
+        return "html"
+    return "csv" if _looks_delimited(text) else None
+
+
+def _looks_delimited(head: bytes) -> bool:
+    """Whether the leading lines split into the same number (2+) of fields"""
+    if b"\0" in head:
+        return False
+    lines = head.decode("utf-8", errors="replace").splitlines()[:20]
+    if len(head) >= 4096:
+        lines = lines[:-1]  # probably cut short
+    if len(lines) < 2:
+        return False
+    try:
+        dialect = csv.Sniffer().sniff("\n".join(lines), delimiters=csv_ingest.DELIMITERS)
+    except csv.Error:
+        return False
+    widths = {len(row) for row in csv.reader(lines, dialect)}
+    return len(widths) == 1 and widths.pop() >= 2
+
+
+def detect_format(stream: BinaryIO, name: str = "", content_type: str = "") -> Optional[str]:
+    """Best guess at a file's format, or None if it is not a known data format"""
+    stream.seek(0)
+    head = stream.read(4096)
+    stream.seek(0)
+    for magic, fmt in MAGIC:
+        if head.startswith(magic):
+            if fmt == "zip" and _is_xlsx(stream):
+                return "xlsx"
+            return fmt
+    fmt = CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    return fmt or _extension_format(name) or _sniff_text(head)
+
+
+def _is_xlsx(stream: BinaryIO) -> bool:
+    try:
+        with zipfile.ZipFile(stream) as archive:
+            return "xl/workbook.xml" in archive.namelist()
+    except zipfile.BadZipFile:
+        return False
+    finally:
+        stream.seek(0)
+
+
+def _spool_copy(source: BinaryIO) -> BinaryIO:
+    """Copy a decompressing stream into a temp file, capped at DOWNLOAD_MAX_BYTES"""
+    spool = tempfile.SpooledTemporaryFile(max_size=config.DOWNLOAD_SPOOL_BYTES)
+    copied = 0
+    while True:
+        chunk = source.read(1024 * 1024)
+        if not chunk:
+            break
+        copied += len(chunk)
+        if copied > config.DOWNLOAD_MAX_BYTES:
+            spool.close()
+            raise ValueError(f"Archive member exceeds {config.DOWNLOAD_MAX_BYTES} bytes")
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+class Dataset:
+    """One attachment file; parsed by its format's loader on first access"""
+
+    def __init__(self, name: str, fmt: Optional[str], stream: BinaryIO):
+        self.name = name
+        self.format = fmt
+        self.stream = stream
+        self._loaded = False
+        self._value = None
+
+    @property
+    def value(self) -> Any:
+        """DataFrame, structured object, or None if the format has no loader or fails to parse"""
+        if not self._loaded:
+            self._loaded = True
+            loader = LOADERS.get(self.format)
+            if loader is not None:
+                try:
+                    self.stream.seek(0)
+                    self._value = loader(self.stream)
+                except Exception as e:
+                    print(f"Error loading {self.format} data from {self.name}: {e}")
+        return self._value
+
+    @property
+    def frame(self) -> Optional[pd.DataFrame]:
+        value = self.value
+        return value if isinstance(value, pd.DataFrame) else None
+
+    def close(self):
+        self.stream.close()
+
+
+def open_datasets(stream: BinaryIO, name: str = "", content_type: str = "",
+                  depth: int = 0) -> List[Dataset]:
+    """Detect the format of a file, unwrapping zip/gzip archives into their
+    members. Blocking (decompression); run off the event loop."""
+    fmt = detect_format(stream, name, content_type)
+    if fmt == "gzip" and depth < MAX_ARCHIVE_DEPTH:
+        inner_name = name[:-3] if name.lower().endswith(".gz") else name
+        with gzip.GzipFile(fileobj=stream, mode="rb") as archive:
+            inner = _spool_copy(archive)
+        if depth:
+            stream.close()  # an intermediate copy made here, not the caller's file
+        return open_datasets(inner, inner_name, depth=depth + 1)
+    if fmt == "zip" and depth < MAX_ARCHIVE_DEPTH:
+        datasets = []
+        with zipfile.ZipFile(stream) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or os.path.basename(info.filename).startswith((".", "__MACOSX")):
+                    continue
+                with archive.open(info) as member:
+                    inner = _spool_copy(member)
+                datasets.extend(open_datasets(inner, info.filename, depth=depth + 1))
+        if depth:
+            stream.close()
+        return datasets
+    return [Dataset(name, fmt, stream)]
+
+
+def _records_frame(data: Any) -> Any:
+    """A DataFrame for record-like JSON (a list of objects, or an object
+    holding one), otherwise the object itself"""
+    if isinstance(data, list) and data:
+        if all(isinstance(item, dict) for item in data):
+            return pd.json_normalize(data)
+        if all(not isinstance(item, (dict, list)) for item in data):
+            return pd.DataFrame({"value": data})
+    if isinstance(data, dict):
+        records = [
+            value for value in data.values()
+            if isinstance(value, list) and value and all(isinstance(item, dict) for item in value)
+        ]
+        if records:
+            return pd.json_normalize(max(records, key=len))
+    return data
+
+
+@register("csv")
+def load_csv(stream: BinaryIO) -> Optional[pd.DataFrame]:
+    info = csv_ingest.sniff(stream)
+    return csv_ingest.read_frame(stream, info) if info else None
+
+
+@register("json")
+def load_json(stream: BinaryIO) -> Any:
+    # The whole document is parsed in memory
+    return _records_frame(json.loads(stream.read().decode("utf-8-sig")))
+
+
+@register("ndjson")
+def load_ndjson(stream: BinaryIO) -> pd.DataFrame:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    try:
+        return pd.read_json(text, lines=True)
+    finally:
+        text.detach()  # leave the underlying stream open
+
+
+@register("xlsx")
+def load_xlsx(stream: BinaryIO) -> Optional[pd.DataFrame]:
+    # Needs openpyxl; the largest sheet is taken as the data
+    sheets = pd.read_excel(stream, sheet_name=None, engine="openpyxl")
+    return max(sheets.values(), key=len) if sheets else None
+
+
+@register("parquet")
+def load_parquet(stream: BinaryIO) -> pd.DataFrame:
+    # Needs pyarrow or fastparquet
+    return pd.read_parquet(stream)
+
+
+@register("html")
+def load_html(stream: BinaryIO) -> Optional[pd.DataFrame]:
+    text = stream.read().decode("utf-8", errors="replace")
+    try:
+        tables = pd.read_html(io.StringIO(text), flavor="lxml")
+    except ValueError:
+        return None  # no <table> elements
+    return max(tables, key=len) if tables else None
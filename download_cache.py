@@ -0,0 +1,170 @@
+"""
+On-disk HTTP download cache with conditional revalidation
+
+Bodies are stored once per content hash, so identical files served from
+different URLs share a blob. A SQLite index maps each URL to its blob and
+validators (ETag / Last-Modified) and tracks freshness from Cache-Control.
+"""
+
+import os
+import re
+import time
+import shutil
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, BinaryIO
+
+import config
+import metrics
+
+
+def cache_key(url: str, headers: Optional[dict] = None) -> str:
+    """Requests with different headers (e.g. auth) get separate entries"""
+    if not headers:
+        return url
+    extra = "&".join(f"{k.lower()}={v}" for k, v in sorted(headers.items()))
+    return f"{url}#{hashlib.sha256(extra.encode()).hexdigest()[:16]}"
+
+
+def freshness_lifetime(headers) -> Optional[float]:
+    """Seconds a response may be reused without revalidation, or None if it must not be stored.
+
+    Without an explicit max-age a response is never fresh: it is kept (with
+    lifetime 0) only if an ETag or Last-Modified allows revalidating it.
+    """
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match and "no-cache" not in cache_control:
+        return float(match.group(1))
+    if headers.get("etag") or headers.get("last-modified"):
+        return 0.0
+    return None
+
+
+class DownloadCache:
+    """Size-bounded LRU cache of downloaded files"""
+
+    def __init__(self, directory: str = config.DOWNLOAD_CACHE_DIR,
+                 max_bytes: int = config.DOWNLOAD_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, content_hash TEXT NOT NULL, size INTEGER NOT NULL, "
+            "etag TEXT, last_modified TEXT, expires_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "content_type TEXT)"
+        )
+        try:
+            # Indexes created before content types were recorded
+            self._db.execute("ALTER TABLE entries ADD COLUMN content_type TEXT")
+        except sqlite3.OperationalError:
+            pass
+        self._db.commit()
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, "blobs", content_hash)
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Return the entry for a key, or None if missing or its blob is gone"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_hash, size, etag, last_modified, expires_at, content_type "
+                "FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None or not os.path.exists(self._blob_path(row[0])):
+            return None
+        return {
+            "content_hash": row[0], "size": row[1], "etag": row[2],
+            "last_modified": row[3], "expires_at": row[4], "content_type": row[5],
+        }
+
+    def validators(self, entry: dict) -> dict:
+        """Conditional request headers for revalidating an entry"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def open(self, key: str, entry: dict, result: str) -> BinaryIO:
+        """Open a cached body, recording the hit. Raises OSError if the blob
+        has been evicted since the lookup."""
+        body = open(self._blob_path(entry["content_hash"]), "rb")
+        with self._lock:
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        metrics.DOWNLOAD_CACHE.labels(result).inc()
+        metrics.DOWNLOAD_CACHE_BYTES_SAVED.inc(entry["size"])
+        return body
+
+    def refresh(self, key: str, headers):
+        """Extend an entry's freshness after a 304 Not Modified"""
+        lifetime = freshness_lifetime(headers) or 0.0
+        with self._lock:
+            self._db.execute(
+                "UPDATE entries SET expires_at = ? WHERE key = ?", (time.time() + lifetime, key)
+            )
+            self._db.commit()
+
+    def store(self, key: str, body: BinaryIO, content_hash: str, size: int, headers):
+        """Copy a downloaded body into the cache (blocking; run off the event loop)"""
+        lifetime = freshness_lifetime(headers)
+        if lifetime is None or size > self.max_bytes:
+            return
+        path = self._blob_path(content_hash)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            body.seek(0)
+            with open(tmp_path, "wb") as f:
+                shutil.copyfileobj(body, f)
+            os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, content_hash, size, etag, last_modified, "
+                "expires_at, accessed_at, content_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, content_hash, size, headers.get("etag"), headers.get("last-modified"),
+                 now + lifetime, now, headers.get("content-type")),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the unique blobs fit in max_bytes"""
+        rows = self._db.execute(
+            "SELECT key, content_hash, size FROM entries ORDER BY accessed_at DESC"
+        ).fetchall()
+        seen, total, dropped = set(), 0, []
+        for key, content_hash, size in rows:
+            if content_hash not in seen:
+                seen.add(content_hash)
+                total += size
+            if total > self.max_bytes:
+                dropped.append((key, content_hash))
+        for key, _ in dropped:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        for _, content_hash in dropped:
+            still_used = self._db.execute(
+                "SELECT 1 FROM entries WHERE content_hash = ? LIMIT 1", (content_hash,)
+            ).fetchone()
+            if not still_used:
+                try:
+                    os.remove(self._blob_path(content_hash))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        """Entry count and bytes on disk"""
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {"entries": count, "bytes": size}
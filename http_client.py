@@ -0,0 +1,130 @@
+"""
+Shared async HTTP client for quiz pages, file downloads and answer submission
+"""
+
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import httpx
+
+import config
+
+_client: Optional[httpx.AsyncClient] = None
+_host_limits: Dict[str, asyncio.Semaphore] = {}
+_last_used: Dict[str, float] = {}  # origin -> time.monotonic() of its last request
+# A private client and host limits for run_sync, which runs on its own event loop
+_scope: ContextVar[Optional[dict]] = ContextVar("http_client_scope", default=None)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_http2_available(),
+        follow_redirects=True,
+        timeout=config.HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_SECONDS,
+        ),
+    )
+
+
+async def start():
+    """Create the shared client (called from the app lifespan)"""
+    global _client
+    if _client is None:
+        _client = _new_client()
+
+
+async def stop():
+    """Close the shared client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_limits.clear()
+    _last_used.clear()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use"""
+    global _client
+    scope = _scope.get()
+    if scope is not None:
+        return scope["client"]
+    if _client is None:
+        _client = _new_client()
+    return _client
+
+
+def _origin(url: str) -> str:
+    parts = urlparse(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    _last_used[_origin(url)] = time.monotonic()
+    host = urlparse(url).hostname or ""
+    scope = _scope.get()
+    limits = scope["host_limits"] if scope is not None else _host_limits
+    if host not in limits:
+        limits[host] = asyncio.Semaphore(config.HTTP_MAX_PER_HOST)
+    return limits[host]
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request through the shared client, limited per host"""
+    async with _host_limit(url):
+        return await get_client().request(method, url, **kwargs)
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs):
+    """Stream a response body through the shared client, limited per host"""
+    async with _host_limit(url):
+        async with get_client().stream(method, url, **kwargs) as response:
+            yield response
+
+
+async def warm(url: str):
+    """Open a pooled connection (DNS, TCP, TLS) to url's origin ahead of use.
+
+    Sends a HEAD to url itself, the endpoint about to be used, and ignores the
+    response; skipped when the origin was used recently enough that its
+    connection is still kept alive.
+    """
+    origin = _origin(url)
+    if time.monotonic() - _last_used.get(origin, float("-inf")) < config.HTTP_KEEPALIVE_SECONDS / 2:
+        return
+    try:
+        await request("HEAD", url, timeout=config.HTTP_FETCH_TIMEOUT)
+    except Exception as e:
+        print(f"Connection warm-up to {origin} failed: {e}")
+
+
+def run_sync(coro_factory):
+    """Run an async HTTP call from synchronous code (e.g. the CLI).
+
+    The call gets its own short-lived client on the new event loop; the
+    shared client is left open for its other users.
+    """
+    async def runner():
+        client = _new_client()
+        token = _scope.set({"client": client, "host_limits": {}})
+        try:
+            return await coro_factory()
+        finally:
+            _scope.reset(token)
+            await client.aclose()
+    return asyncio.run(runner())
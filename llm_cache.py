@@ -0,0 +1,150 @@
+"""
+Content-addressed cache for LLM responses
+"""
+
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import config
+import metrics
+
+
+def make_key(request: dict) -> str:
+    """Hash a model request (model, prompts, data, sampling params) into a cache key"""
+    encoded = json.dumps(request, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class LLMCache:
+    """In-memory LRU cache with an optional SQLite tier behind it"""
+
+    def __init__(self, max_entries: int = config.LLM_CACHE_SIZE,
+                 ttl_seconds: float = config.LLM_CACHE_TTL_SECONDS,
+                 db_path: str = config.LLM_CACHE_DB,
+                 db_max_entries: int = config.LLM_CACHE_DB_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_max_entries = db_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on miss or expiry"""
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = self._get_db(key)
+        return self._count(value)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """get() with the SQLite tier read in a worker thread"""
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._get_db, key)
+        return self._count(value)
+
+    def set(self, key: str, value: str):
+        """Store a response in both tiers"""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now),
+                )
+                self._evict_db(now)
+                self._db.commit()
+
+    async def set_async(self, key: str, value: str):
+        """set() in a worker thread, off the event loop"""
+        await asyncio.to_thread(self.set, key, value)
+
+    def invalidate(self, keys: Iterable[str]):
+        """Drop responses from both tiers, e.g. ones that led to a rejected answer"""
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._memory.pop(key, None)
+            if self._db is not None and keys:
+                self._db.executemany("DELETE FROM llm_cache WHERE key = ?", [(key,) for key in keys])
+                self._db.commit()
+
+    async def invalidate_async(self, keys: Iterable[str]):
+        """invalidate() in a worker thread, off the event loop"""
+        await asyncio.to_thread(self.invalidate, keys)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                return value
+            del self._memory[key]
+            return None
+
+    def _get_db(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            self._db.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            self._remember(key, row[1], row[0])
+            return row[0]
+
+    def _count(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            self.misses += 1
+            metrics.LLM_CACHE.labels("miss").inc()
+        else:
+            self.hits += 1
+            metrics.LLM_CACHE.labels("hit").inc()
+        return value
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_db(self, now: float):
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.db_max_entries,),
+        )
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._memory),
+        }
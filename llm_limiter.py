@@ -0,0 +1,255 @@
+"""
+Client-side rate limiting for the LLM backend
+
+Each model has requests-per-minute and tokens-per-minute buckets. Calls wait
+in one queue ordered by deadline, so the call whose chain runs out of time
+first is sent first. A global cap bounds the calls in flight. A 429 pauses
+that model for its Retry-After, or for an exponential backoff if the
+response has none.
+"""
+
+import time
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import config
+import metrics
+
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class RequestTooLarge(ValueError):
+    """Raised for a call that needs more tokens than the model's per-minute limit"""
+
+
+class TokenBucket:
+    """`per_minute` units, refilled continuously; starts full"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (amounts above capacity
+        only wait for a full bucket)"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float):
+        """Take `amount` units; the bucket may go into debt"""
+        self.tokens -= amount
+
+    def drain(self):
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _ModelLimits:
+    def __init__(self, limits: Optional[dict]):
+        limits = limits or {}
+        self.requests = TokenBucket(limits["rpm"]) if limits.get("rpm") else None
+        self.tokens = TokenBucket(limits["tpm"]) if limits.get("tpm") else None
+        self.blocked_until = 0.0
+        self.backoff = 0.0
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        wait = max(0.0, self.blocked_until - now)
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def consume(self, tokens: int):
+        if self.requests is not None:
+            self.requests.consume(1)
+        if self.tokens is not None:
+            self.tokens.consume(tokens)
+
+
+class _Waiter:
+    def __init__(self, deadline: float, seq: int, model: str, tokens: int, future: asyncio.Future):
+        self.deadline = deadline
+        self.seq = seq
+        self.model = model
+        self.tokens = tokens
+        self.future = future
+        self.queued = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+
+class LLMRateLimiter:
+    """Shared admission control for model calls.
+
+    Use `async with limiter.slot(model, tokens, deadline):` around each call,
+    then report the outcome with `record_usage`, `on_success` or
+    `on_rate_limited`.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, dict]] = None,
+                 default: Optional[dict] = config.LLM_DEFAULT_RATE_LIMIT,
+                 max_in_flight: int = config.LLM_MAX_IN_FLIGHT):
+        self.limits = config.LLM_RATE_LIMITS if limits is None else limits
+        self.default = default
+        self.max_in_flight = max_in_flight
+        self._models: Dict[str, _ModelLimits] = {}
+        self._waiters: List[_Waiter] = []
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _model(self, model: str) -> _ModelLimits:
+        if model not in self._models:
+            self._models[model] = _ModelLimits(self.limits.get(model, self.default))
+        return self._models[model]
+
+    def _kick(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch(self):
+        """Grant waiting calls in deadline order as capacity frees up. A call
+        that does not fit yet holds back later calls for the same model only."""
+        self._wakeup = asyncio.Event()
+        try:
+            while self._waiters:
+                self._wakeup.clear()
+                now = time.monotonic()
+                next_check = None
+                blocked = set()
+                for waiter in sorted(self._waiters):
+                    if waiter.future.done():
+                        self._waiters.remove(waiter)  # caller gave up
+                        continue
+                    if self._in_flight >= self.max_in_flight:
+                        break
+                    if waiter.model in blocked:
+                        continue
+                    limits = self._model(waiter.model)
+                    wait = limits.wait_time(waiter.tokens, now)
+                    if wait > 0:
+                        blocked.add(waiter.model)
+                        next_check = wait if next_check is None else min(next_check, wait)
+                        continue
+                    limits.consume(waiter.tokens)
+                    self._in_flight += 1
+                    self._waiters.remove(waiter)
+                    metrics.LLM_QUEUE_WAIT.observe(now - waiter.queued)
+                    waiter.future.set_result(None)
+                if not self._waiters:
+                    break
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=next_check)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._dispatcher = None
+
+    def _release(self):
+        self._in_flight -= 1
+        self._kick()
+
+    @asynccontextmanager
+    async def slot(self, model: str, tokens: int, deadline: Optional[float] = None):
+        """Wait for room to send a call of about `tokens` tokens (prompt plus
+        reply). `deadline` (time.monotonic()) sets its place in the queue;
+        cancel the caller to give up waiting. Raises RequestTooLarge if the
+        call could never fit the model's tokens-per-minute bucket."""
+        bucket = self._model(model).tokens
+        if bucket is not None and tokens > bucket.capacity:
+            # Queueing it would only push the bucket into debt for minutes;
+            # the provider would reject it anyway
+            raise RequestTooLarge(f"{model}: {tokens} tokens exceed its limit of {bucket.capacity:.0f} per minute")
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(deadline if deadline is not None else float("inf"),
+                         next(self._seq), model, tokens, future)
+        self._waiters.append(waiter)
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        else:
+            self._kick()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # granted just as the caller was cancelled
+            else:
+                future.cancel()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def has_capacity(self, model: str, tokens: int) -> bool:
+        """Whether a call could be sent right now without queueing"""
+        return (
+            not self._waiters and self._in_flight < self.max_in_flight
+            and self._model(model).wait_time(tokens, time.monotonic()) <= 0
+        )
+
+    def record_usage(self, model: str, estimated: int, actual: Optional[int]):
+        """Correct the token bucket once the provider reports real usage"""
+        limits = self._model(model)
+        if actual is not None and limits.tokens is not None:
+            limits.tokens.consume(actual - estimated)
+            self._kick()
+
+    def on_success(self, model: str):
+        self._model(model).backoff = 0.0
+
+    def on_rate_limited(self, model: str, retry_after: Optional[float] = None):
+        """Pause the model for Retry-After seconds, or a doubling backoff"""
+        limits = self._model(model)
+        if retry_after is None:
+            limits.backoff = min(MAX_BACKOFF_SECONDS, max(1.0, limits.backoff * 2))
+            pause = limits.backoff
+        else:
+            pause = retry_after
+        limits.blocked_until = max(limits.blocked_until, time.monotonic() + pause)
+        # The provider's view of our usage wins over our estimate
+        if limits.requests is not None:
+            limits.requests.drain()
+        metrics.LLM_RATE_LIMITED.labels(model).inc()
+        print(f"Rate limited by the LLM provider on {model}, pausing {pause:.1f}s")
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether a client exception is an HTTP 429 from the provider"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the error response's Retry-After header, if it has one"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None  # an HTTP date; fall back to backoff
+
+
+def usage_tokens(message: Any) -> Optional[int]:
+    """Total tokens a response reports using, if any"""
+    usage = getattr(message, "usage", None)
+    if usage is None:
+        return None
+    prompt = getattr(usage, "input_tokens", None) or getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "output_tokens", None) or getattr(usage, "completion_tokens", None)
+    if prompt is None and completion is None:
+        return None
+    return int((prompt or 0) + (completion or 0))
@@ -4,20 +4,32 @@ import json
 import base64
 import asyncio
 import sys
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 from typing import Optional, Any
-import requests
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, Response
 from pydantic import BaseModel
-from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from groq import Groq
 import pandas as pd
 import io
 import uuid
+from urllib.parse import urlparse, urljoin
 from dotenv import load_dotenv
-from quiz_solver import QuizSolver
+import tldextract
+from quiz_solver import QuizSolver, recording_cache_keys
+from browser_pool import browser_pool
+import http_client
+import metrics
+import tracing
+import query_engine
+import pdf_extractor
+import data_loader
+from task_store import create_task_store
+from scheduler import ChainDeadline, StageTimeout, AdaptiveRateLimiter
+import config
 
 # Load environment variables
 load_dotenv()
@@ -34,10 +46,25 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY environment variable not set")
 
-app = FastAPI(title="LLM Quiz Solver")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Keep a pooled HTTP client for the lifetime of the server. Chromium is
+    launched on the first page that needs rendering, so the server still runs
+    (HTTP-only) where no browser is installed."""
+    await http_client.start()
+    yield
+    quiz_results.close()
+    await browser_pool.stop()
+    await http_client.stop()
+    pdf_extractor.shutdown()
 
-# Store for quiz results
-quiz_results = {}
+app = FastAPI(title="LLM Quiz Solver", lifespan=lifespan)
+
+# Store for quiz results (bounded, see TASK_* in config.py)
+quiz_results = create_task_store()
+
+# Event queues of clients streaming each task's progress
+task_subscribers = {}
 
 # Enable CORS
 app.add_middleware(
@@ -60,32 +87,129 @@ class QuizRequest(BaseModel):
 # Store for active quiz sessions
 quiz_sessions = {}
 
+# Paces hops to each quiz host
+hop_limiter = AdaptiveRateLimiter()
+
+# Which fetch tier served each quiz page
+fetch_tier_counts = {"http": 0, "browser": 0}
+
+def publish(task_id: str, event: dict):
+    """Push an event to every client streaming this task"""
+    for queue in task_subscribers.get(task_id, []):
+        queue.put_nowait(event)
+
 def verify_credentials(email: str, secret: str) -> bool:
     """Verify student credentials"""
     return email == STUDENT_EMAIL and secret == STUDENT_SECRET
 
-async def fetch_quiz_page(url: str) -> str:
+# Resolves once #result has text, or once the page has loaded without one
+RESULT_READY_JS = """() => {
+    const el = document.querySelector('#result');
+    if (el) return el.innerText.trim().length > 0;
+    return document.readyState === 'complete';
+}"""
+
+# Bundled public suffix snapshot; never fetch the list at runtime
+_tld_extract = tldextract.TLDExtract(suffix_list_urls=())
+
+def _site(host: str) -> str:
+    """Reduce a hostname to its registrable domain for same-site checks
+    (example.co.uk); IP addresses and bare hosts are kept whole"""
+    return _tld_extract(host).registered_domain or host
+
+def make_request_filter(page_url: str):
+    """Build a route handler that aborts requests we never read"""
+    page_site = _site(urlparse(page_url).hostname or "")
+    blocked_types = set(config.BROWSER_BLOCKED_RESOURCES)
+    allowlist = set(config.BROWSER_THIRD_PARTY_ALLOWLIST)
+
+    async def handle(route):
+        request = route.request
+        host = urlparse(request.url).hostname or ""
+        third_party = host and _site(host) != page_site and host not in allowlist
+        if request.resource_type in blocked_types or (config.BROWSER_BLOCK_THIRD_PARTY and third_party):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    return handle
+
+async def render_quiz_page(url: str) -> str:
     """Fetch and render JavaScript-rendered quiz page"""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.goto(url, wait_until="networkidle")
-        content = await page.content()
-        await browser.close()
-        return content
+    async with browser_pool.context() as context:
+        await context.route("**/*", make_request_filter(url))
+        page = await context.new_page()
+        await page.goto(url, wait_until="domcontentloaded", timeout=config.BROWSER_TIMEOUT)
+        try:
+            await page.wait_for_function(RESULT_READY_JS, timeout=config.BROWSER_TIMEOUT)
+        except PlaywrightTimeoutError:
+            print(f"Timed out waiting for #result on {url}, using current DOM")
+        return await page.content()
+
+def decode_inline_base64(html: str) -> str:
+    """Decode atob("...") payloads embedded in inline scripts"""
+    decoded = []
+    for payload in re.findall(r'atob\(\s*[`"\']([A-Za-z0-9+/=\s]+)[`"\']\s*\)', html):
+        try:
+            decoded.append(base64.b64decode(re.sub(r'\s+', '', payload)).decode('utf-8'))
+        except Exception:
+            continue
+    return "\n".join(decoded)
+
+async def fetch_quiz_page_http(url: str) -> Optional[str]:
+    """Fetch quiz page without a browser, returning None if it needs rendering"""
+    try:
+        response = await http_client.request("GET", url, timeout=config.HTTP_FETCH_TIMEOUT)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"HTTP fetch failed, falling back to browser: {e}")
+        return None
 
+    html = response.text
+    if parse_quiz_instruction(html)["instruction"] and extract_submit_url(html):
+        return html
+
+    # Content injected by an inline script: put the decoded payload where the
+    # browser would have rendered it
+    decoded = decode_inline_base64(html)
+    if decoded:
+        html = f'<div id="result">{decoded}</div>\n{html}'
+        if parse_quiz_instruction(html)["instruction"] and extract_submit_url(html):
+            return html
+    return None
+
+@metrics.timed("fetch")
+async def fetch_quiz_page(url: str) -> tuple:
+    """Fetch quiz page over plain HTTP, escalating to the browser when needed.
+
+    Returns (html, tier) where tier is "http" or "browser".
+    """
+    html = await fetch_quiz_page_http(url)
+    tier = "http"
+    if html is None:
+        html = await render_quiz_page(url)
+        tier = "browser"
+    fetch_tier_counts[tier] += 1
+    metrics.FETCH_TIER.labels(tier).inc()
+    return html, tier
+
+@metrics.timed("extract")
 def extract_quiz_instruction(html: str) -> dict:
-    """Parse quiz instruction from HTML"""
+    """Parse quiz instruction from HTML (the timed, once-per-hop extraction)"""
+    return parse_quiz_instruction(html)
+
+def parse_quiz_instruction(html: str) -> dict:
+    """Parse quiz instruction from HTML; untimed, for probes such as the HTTP fetch check"""
     # Extract text content from result div
-    import re
     match = re.search(r'<div[^>]*id="result"[^>]*>(.*?)</div>', html, re.DOTALL)
     if match:
         content = match.group(1)
         # Remove HTML tags
         instruction = re.sub(r'<[^>]+>', '', content)
         instruction = instruction.strip()
-        return {"instruction": instruction}
-    return {"instruction": ""}
+        links = re.findall(r'href=["\']([^"\']+)["\']', content)
+        return {"instruction": instruction, "links": links}
+    return {"instruction": "", "links": []}
 
 def extract_submit_url(html: str) -> Optional[str]:
     """Extract submit endpoint URL from quiz page"""
@@ -101,8 +225,39 @@ def extract_submit_url(html: str) -> Optional[str]:
             return match.group(0).replace('"', '')
     return None
 
-async def solve_quiz(quiz_data: dict) -> Any:
-    """Use Groq LLM to analyze and solve the quiz"""
+async def answer_from_dataset(instruction: str, dataset, context: list,
+                              deadline: Optional[float] = None, escalate: bool = False) -> Any:
+    """Answer from one attachment file, or add its text to `context` for the LLM"""
+    if dataset.format == "csv":
+        return await solver.answer_csv_with_plan(instruction, dataset.stream, deadline, escalate)
+    if dataset.format == "pdf":
+        pages = pdf_extractor.requested_pages(instruction)
+        df = pdf_extractor.merge_tables(await solver.extract_pdf_tables_async(dataset.stream, pages))
+        if df is not None and not df.empty:
+            result = await solver.answer_with_plan(instruction, df, deadline, escalate)
+            if result is not None:
+                return result
+        # No usable table, or its plan failed: the LLM gets the page text
+        text = await solver.extract_pdf_pages_async(dataset.stream, pages)
+        context.append("\n".join(text))
+        return None
+    else:
+        value = await solver.load_data_async(dataset)
+        if value is not None and not isinstance(value, pd.DataFrame):
+            context.append(json.dumps(value, default=str))
+            return None
+        df = value
+    if df is None or df.empty:
+        return None
+    return await solver.answer_with_plan(instruction, df, deadline, escalate)
+
+@metrics.timed("solve")
+async def solve_quiz(quiz_data: dict, deadline: Optional[float] = None, escalate: bool = False) -> Any:
+    """Use Groq LLM to analyze and solve the quiz (on the strong model when `escalate` is set).
+
+    Returns the LLM's reply text, or a query_engine.PlanAnswer when a query
+    plan answered the question from an attachment.
+    """
     instruction = quiz_data.get("instruction", "")
     
     system_prompt = """You are an expert data analyst and problem solver. 
@@ -110,12 +265,65 @@ Your task is to analyze data queries, perform calculations, and provide accurate
 Always extract the exact numerical answer or required information from the context.
 Focus on precision and accuracy. Return ONLY the final answer in the requested format."""
     
-    return solver.analyze_data(instruction, instruction)
+    # Tabular attachments (CSV, JSON, Excel, Parquet, HTML tables and tables
+    # inside PDFs, also inside zip/gzip archives) are answered locally from an
+    # LLM-written query plan; other PDF text (only the pages the question
+    # names) and non-tabular JSON are passed to the LLM
+    context = []
+    # Never fetched as data: GETs on these have side effects or return pages
+    known_pages = {quiz_data.get("url"), quiz_data.get("submit_url")}
+    for link in quiz_data.get("links", []):
+        if link.startswith("#"):
+            continue  # an anchor on the quiz page itself
+        url = urljoin(quiz_data.get("url", ""), link)
+        path = urlparse(url).path.lower()
+        if url in known_pages:
+            continue
+        if not data_loader.is_data_link(path):
+            # An extensionless link is downloaded only if a HEAD says it serves data
+            if not data_loader.may_be_data_link(path):
+                continue
+            if not data_loader.is_data_content_type(await solver.probe_content_type_async(url)):
+                continue
+        response = {}
+        spool = await solver.download_to_file_async(url, response_info=response)
+        if spool is None:
+            continue
+        with spool:
+            datasets = await solver.open_attachment_async(spool, path, response.get("content_type", ""))
+            try:
+                for dataset in datasets:
+                    result = await answer_from_dataset(instruction, dataset, context, deadline, escalate)
+                    if result is not None:
+                        return query_engine.PlanAnswer(result)
+            finally:
+                for dataset in datasets:
+                    dataset.close()
+    
+    data = "\n\n".join([instruction] + context)
+    if config.CONSENSUS_CANDIDATES > 1:
+        return await solver.analyze_data_consensus(instruction, data, instruction, deadline=deadline,
+                                                   escalate=escalate)
+    return await solver.analyze_data_async(instruction, data, deadline=deadline, escalate=escalate)
 
+@metrics.timed("parse")
 def parse_answer(response_text: str, instruction: str) -> Any:
     """Parse LLM response to extract the answer in correct format"""
     return solver.parse_answer(response_text, instruction)
 
+def answer_from_solution(solution: Any, instruction: str) -> Any:
+    """The answer to submit: a query plan's typed result as-is, or the parsed LLM reply"""
+    if isinstance(solution, query_engine.PlanAnswer):
+        return solution.value
+    return parse_answer(solution, instruction)
+
+def best_effort_answer(instruction: str) -> Any:
+    """A placeholder for a question there was no time to solve, in the type
+    the instruction asks for (never empty). The submit endpoint returns the
+    next URL even for a wrong answer, so submitting it keeps the chain going."""
+    return parse_answer("0", instruction)
+
+@metrics.timed("submit")
 async def submit_answer(submit_url: str, email: str, secret: str, quiz_url: str, answer: Any) -> dict:
     """Submit answer to the quiz endpoint"""
     payload = {
@@ -126,112 +334,240 @@ async def submit_answer(submit_url: str, email: str, secret: str, quiz_url: str,
     }
     
     try:
-        response = requests.post(submit_url, json=payload, timeout=30)
+        await hop_limiter.wait(submit_url)
+        response = await http_client.request("POST", submit_url, json=payload, timeout=30)
+        hop_limiter.record(submit_url, response.status_code)
         return response.json()
     except Exception as e:
         print(f"Error submitting answer: {e}")
         return {"correct": False, "reason": str(e)}
 
+async def warm_next_hop(submit_url: str, tier: str):
+    """Set up the submit connection (and a browser context, for pages that
+    needed one) while the LLM works. The next page usually comes from the
+    submit host, so its fetch starts warm too."""
+    warmups = [http_client.warm(submit_url)]
+    if tier == "browser":
+        warmups.append(browser_pool.warm())
+    for outcome in await asyncio.gather(*warmups, return_exceptions=True):
+        if isinstance(outcome, Exception):
+            print(f"Warm-up failed: {outcome}")
+
+async def prefetch_quiz_page(url: str) -> tuple:
+    """fetch_quiz_page for a URL the chain will visit next"""
+    with tracing.span("prefetch", url=url):
+        return await fetch_quiz_page(url)
+
+@metrics.track_active
 async def process_quiz_chain(task_id: str, email: str, secret: str, initial_url: str):
     """Process quiz chain until completion"""
-    # Initialize result entry
-    quiz_results[task_id] = {
-        "status": "processing",
-        "logs": [],
-        "result": None
-    }
+    # Initialize result entry (normally already created by handle_quiz)
+    if task_id not in quiz_results:
+        quiz_results.create(task_id)
     
     def log(message: str):
         print(message)
         timestamp = datetime.now().strftime('%H:%M:%S')
-        quiz_results[task_id]["logs"].append(f"[{timestamp}] {message}")
+        line = f"[{timestamp}] {message}"
+        index = quiz_results.append_log(task_id, line)
+        publish(task_id, {"type": "log", "index": index, "line": line})
+    
+    def save_trace():
+        if trace is not None:
+            quiz_results.update(task_id, trace=trace.to_dict())
+    
+    final = {}
+    def finish(status: str, result: dict):
+        # Applied after the loop, once the trace has been closed and saved
+        final["status"], final["result"] = status, result
+    
+    # Hops overlap: the next page is fetched as soon as its URL is known, and
+    # connections are warmed during the LLM call
+    next_fetch: Optional[asyncio.Task] = None
+    next_fetch_url = None
+    warmups = set()
+    
+    def prefetch(url: Optional[str]):
+        nonlocal next_fetch, next_fetch_url
+        if next_fetch is not None and url == next_fetch_url:
+            return
+        if next_fetch is not None:
+            next_fetch.cancel()
+        next_fetch, next_fetch_url = None, None
+        if url and config.PIPELINE_PREFETCH and attempt_count < max_attempts:
+            # Traced under the chain root: the hop that starts it ends first
+            next_fetch = asyncio.create_task(prefetch_quiz_page(url), context=tracing.detached())
+            next_fetch_url = url
 
+    trace = tracing.start_trace(task_id)
     current_url = initial_url
-    attempt_start = datetime.now()
-    max_attempts = 10
+    chain = ChainDeadline(config.QUIZ_TIMEOUT_SECONDS)
+    max_attempts = config.MAX_QUIZ_ATTEMPTS
     attempt_count = 0
     
     log(f"Starting quiz processing for {initial_url}")
     
     while current_url and attempt_count < max_attempts:
         attempt_count += 1
+        save_trace()
         
         # Check if within 3-minute window (from initial request)
-        if (datetime.now() - attempt_start) > timedelta(minutes=3):
+        if chain.expired():
             log(f"Exceeded 3-minute limit for quiz at {current_url}")
-            quiz_results[task_id]["status"] = "failed"
-            quiz_results[task_id]["result"] = {"error": "Time limit exceeded"}
+            finish("failed", {"error": "Time limit exceeded"})
             break
         
-        log(f"Processing quiz at {current_url} (attempt {attempt_count})")
+        with tracing.span("hop", url=current_url, attempt=attempt_count):
+            log(f"Processing quiz at {current_url} (attempt {attempt_count}, {chain.remaining():.0f}s left)")
         
-        try:
-            # Fetch quiz page
-            log("Fetching quiz page...")
-            html = await fetch_quiz_page(current_url)
-            
-            # Extract instruction
-            quiz_data = extract_quiz_instruction(html)
-            log(f"Quiz instruction: {quiz_data['instruction'][:100]}...")
+            try:
+                # Fetch quiz page
+                if next_fetch is None or next_fetch_url != current_url:
+                    log("Fetching quiz page...")
+                    fetch = asyncio.create_task(fetch_quiz_page(current_url))
+                else:
+                    log("Fetching quiz page (prefetched)...")
+                    fetch = next_fetch
+                    next_fetch, next_fetch_url = None, None
+                html, tier = await chain.run("fetch", fetch)
+                log(f"Fetched quiz page via {tier}")
             
-            # Get submit URL from page
-            submit_url = extract_submit_url(html)
-            if not submit_url:
-                log(f"Could not extract submit URL from {current_url}")
-                quiz_results[task_id]["status"] = "failed"
-                quiz_results[task_id]["result"] = {"error": "Could not find submit URL"}
-                break
+                # Extract instruction (regex parsing, cheap enough to run inline)
+                quiz_data = extract_quiz_instruction(html)
+                quiz_data["url"] = current_url
+                instruction = quiz_data.get("instruction", "")
+                log(f"Quiz instruction: {instruction[:100]}...")
             
-            # Solve quiz using LLM
-            log("Solving quiz using LLM...")
-            solution = await solve_quiz(quiz_data)
-            log(f"LLM solution: {solution[:100]}...")
+                # Get submit URL from page
+                submit_url = extract_submit_url(html)
+                if not submit_url:
+                    log(f"Could not extract submit URL from {current_url}")
+                    finish("failed", {"error": "Could not find submit URL"})
+                    break
+                quiz_data["submit_url"] = submit_url
             
-            # Parse answer
-            answer = parse_answer(solution, quiz_data.get("instruction", ""))
-            log(f"Parsed answer: {answer}")
+                if config.PIPELINE_WARM:
+                    warmup = asyncio.create_task(
+                        warm_next_hop(submit_url, tier), context=tracing.detached()
+                    )
+                    warmups.add(warmup)
+                    warmup.add_done_callback(warmups.discard)
             
-            # Submit answer
-            log("Submitting answer...")
-            result = await submit_answer(submit_url, email, secret, current_url, answer)
-            log(f"Submission result: {result}")
+                # Solve quiz using LLM, unless only enough time is left to submit
+                solution, out_of_time = None, chain.nearly_exhausted()
+                cache_keys = set()  # LLM replies behind this answer, dropped if it is rejected
+                if out_of_time:
+                    log("Time nearly exhausted, submitting a best-effort answer")
+                else:
+                    log("Solving quiz using LLM...")
+                    try:
+                        with recording_cache_keys(cache_keys):
+                            solution = await chain.run(
+                                "solve", solve_quiz(quiz_data, chain.stage_deadline("solve"))
+                            )
+                            if not solution and not chain.nearly_exhausted():
+                                # An empty reply means the LLM call failed; it is not worth submitting
+                                log("No answer from the LLM, solving again...")
+                                solution = await chain.run(
+                                    "solve", solve_quiz(quiz_data, chain.stage_deadline("solve"))
+                                )
+                        out_of_time = not solution and chain.nearly_exhausted()
+                    except StageTimeout as e:
+                        log(f"{e}, submitting a best-effort answer")
+                        out_of_time = True
             
-            # Check if correct
-            if result.get("correct"):
-                log("Answer correct!")
-                current_url = result.get("url")  # Get next quiz if available
-                if not current_url:
-                    log("Quiz completed successfully!")
-                    quiz_results[task_id]["status"] = "completed"
-                    quiz_results[task_id]["result"] = {"success": True, "message": "All quizzes completed"}
-                    break
-            else:
-                # Try again or move to next URL
-                next_url = result.get("url")
-                if next_url:
-                    log(f"Moving to next URL: {next_url}")
-                    current_url = next_url
+                # Parse answer
+                if solution:
+                    log(f"LLM solution: {str(solution)[:100]}...")
+                    answer = answer_from_solution(solution, instruction)
+                elif out_of_time:
+                    answer = best_effort_answer(instruction)
                 else:
-                    reason = result.get('reason', 'Unknown error')
-                    log(f"No next URL provided. Reason: {reason}")
-                    quiz_results[task_id]["status"] = "failed"
-                    quiz_results[task_id]["result"] = {"error": reason}
+                    # An empty string is never submitted as an answer
+                    log("No answer from the LLM, not submitting")
+                    finish("failed", {"error": "No answer from the LLM"})
                     break
+                log(f"Parsed answer: {answer}")
+            
+                # Submit answer
+                log("Submitting answer...")
+                result = await chain.run(
+                    "submit", submit_answer(submit_url, email, secret, current_url, answer)
+                )
+                prefetch(result.get("url"))
+                log(f"Submission result: {result}")
+                if not result.get("correct") and cache_keys:
+                    # Solving again must not replay the rejected replies from the cache
+                    await solver.cache.invalidate_async(cache_keys)
+            
+                # A rejected answer gets one more try on the strong model
+                if not result.get("correct") and config.ROUTER_ESCALATE and not chain.nearly_exhausted():
+                    log("Answer rejected, retrying with the strong model...")
+                    escalated_keys = set()
+                    try:
+                        with recording_cache_keys(escalated_keys):
+                            solution = await chain.run(
+                                "solve", solve_quiz(quiz_data, chain.stage_deadline("solve"), escalate=True)
+                            )
+                        retry_answer = answer_from_solution(solution, instruction)
+                        log(f"Escalated answer: {retry_answer}")
+                        if solution and retry_answer != answer:
+                            result = await chain.run(
+                                "submit", submit_answer(submit_url, email, secret, current_url, retry_answer)
+                            )
+                            log(f"Submission result: {result}")
+                            prefetch(result.get("url"))
+                            metrics.MODEL_ESCALATIONS.labels("correct" if result.get("correct") else "wrong").inc()
+                    except StageTimeout as e:
+                        log(f"{e}, keeping the first submission result")
+                    if not result.get("correct") and escalated_keys:
+                        await solver.cache.invalidate_async(escalated_keys)
+            
+                # Check if correct
+                if result.get("correct"):
+                    log("Answer correct!")
+                    current_url = result.get("url")  # Get next quiz if available
+                    if not current_url:
+                        log("Quiz completed successfully!")
+                        finish("completed", {"success": True, "message": "All quizzes completed"})
+                        break
+                else:
+                    metrics.QUIZ_RETRIES.inc()
+                    # Try again or move to next URL
+                    next_url = result.get("url")
+                    if next_url:
+                        log(f"Moving to next URL: {next_url}")
+                        current_url = next_url
+                    else:
+                        reason = result.get('reason', 'Unknown error')
+                        log(f"No next URL provided. Reason: {reason}")
+                        finish("failed", {"error": reason})
+                        break
                     
-        except Exception as e:
-            import traceback
-            error_details = f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
-            log(f"Error processing quiz: {error_details}")
-            quiz_results[task_id]["status"] = "failed"
-            quiz_results[task_id]["result"] = {"error": str(e) or "Unknown error occurred"}
-            break
-        
-        await asyncio.sleep(1)  # Rate limiting
+            except StageTimeout as e:
+                log(f"Stage timed out: {e}")
+                finish("failed", {"error": f"Time limit exceeded ({e})"})
+                break
+            except Exception as e:
+                import traceback
+                error_details = f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+                log(f"Error processing quiz: {error_details}")
+                finish("failed", {"error": str(e) or "Unknown error occurred"})
+                break
+    
+    if next_fetch is not None:
+        next_fetch.cancel()
     
-    if attempt_count >= max_attempts:
+    if attempt_count >= max_attempts and not final:
         log("Max attempts reached")
-        quiz_results[task_id]["status"] = "failed"
-        quiz_results[task_id]["result"] = {"error": "Max attempts reached"}
+        finish("failed", {"error": "Max attempts reached"})
+    
+    tracing.finish_trace(trace)
+    save_trace()
+    if final:
+        quiz_results.set_status(task_id, final["status"], final["result"])
+        metrics.QUIZ_CHAINS.labels(final["status"]).inc()
+        publish(task_id, {"type": "status", **final})
 
 @app.get("/", response_class=HTMLResponse)
 async def serve_frontend():
@@ -257,22 +593,104 @@ async def handle_quiz(request: QuizRequest, background_tasks: BackgroundTasks):
     # Generate task ID
     task_id = str(uuid.uuid4())
     
+    # Register the task up front so clients can subscribe immediately
+    quiz_results.create(task_id)
+    
     # Start quiz processing in background
     background_tasks.add_task(process_quiz_chain, task_id, request.email, request.secret, request.url)
     
     return {"status": "accepted", "message": "Quiz processing started", "task_id": task_id}
 
 @app.get("/quiz/status/{task_id}")
-async def get_quiz_status(task_id: str):
-    """Get status of a quiz task"""
+async def get_quiz_status(task_id: str, since: int = 0):
+    """Get status of a quiz task, with only the log lines from index `since` on"""
+    task = quiz_results.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    task.pop("trace", None)  # served by /quiz/trace
+    logs, next_index = quiz_results.logs_since(task_id, since)
+    return {**task, "logs": logs, "next": next_index}
+
+@app.get("/quiz/trace/{task_id}")
+async def get_quiz_trace(task_id: str, format: str = "json"):
+    """Span tree of a quiz task; format=chrome for about:tracing / Perfetto"""
+    task = quiz_results.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    trace = task.get("trace")
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Task was not sampled for tracing")
+    if format == "chrome":
+        return tracing.to_chrome(trace)
+    return trace
+
+def format_sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Event"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+async def stream_task_events(task_id: str, since: int):
+    """Yield SSE messages for new log lines and status changes of a task"""
+    queue = asyncio.Queue()
+    task_subscribers.setdefault(task_id, []).append(queue)
+    try:
+        # Replay what the client missed, then follow live events
+        task = quiz_results.get(task_id)
+        if task is None:
+            return
+        logs, cursor = quiz_results.logs_since(task_id, since)
+        for index, line in enumerate(logs, start=cursor - len(logs)):
+            yield format_sse("log", {"index": index, "line": line}, index)
+        yield format_sse("status", {"status": task["status"], "result": task["result"]})
+        if task["status"] != "processing":
+            return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event["type"] == "log":
+                if event["index"] < cursor:
+                    continue
+                yield format_sse("log", event, event["index"])
+            else:
+                yield format_sse("status", event)
+                if event["status"] != "processing":
+                    return
+    finally:
+        task_subscribers[task_id].remove(queue)
+        if not task_subscribers[task_id]:
+            del task_subscribers[task_id]
+
+@app.get("/quiz/stream/{task_id}")
+async def stream_quiz_status(task_id: str, since: int = 0, last_event_id: Optional[str] = Header(None)):
+    """Stream a quiz task's log lines and status changes as Server-Sent Events"""
     if task_id not in quiz_results:
         raise HTTPException(status_code=404, detail="Task not found")
-    return quiz_results[task_id]
+    # EventSource reconnects send the id of the last line they received
+    if last_event_id and last_event_id.isdigit():
+        since = max(since, int(last_event_id) + 1)
+    return StreamingResponse(
+        stream_task_events(task_id, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "ok"}
+    return {"status": "ok", "fetch_tiers": fetch_tier_counts}
 
 if __name__ == "__main__":
     import uvicorn
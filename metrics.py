@@ -0,0 +1,102 @@
+"""
+Prometheus metrics and stage timers for the quiz pipeline
+"""
+
+import time
+import inspect
+from functools import wraps
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+import tracing
+
+STAGE_SECONDS = Histogram(
+    "quiz_stage_seconds",
+    "Time spent in each pipeline stage or solver I/O call",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+STAGE_ERRORS = Counter("quiz_stage_errors_total", "Stage calls that raised", ["stage"])
+FETCH_TIER = Counter("quiz_fetch_tier_total", "Quiz pages served by each fetch tier", ["tier"])
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the LLM backend", ["kind"])
+LLM_CACHE = Counter("llm_cache_requests_total", "LLM response cache lookups", ["result"])
+MODEL_ROUTES = Counter("llm_model_routes_total", "LLM requests by question class and model", ["question_class", "model"])
+MODEL_ESCALATIONS = Counter("llm_model_escalations_total", "Rejected answers resubmitted from the strong model", ["outcome"])
+LLM_CONSENSUS = Counter("llm_consensus_total", "Voted analyses by how they were decided", ["outcome"])
+LLM_HEDGES = Counter("llm_hedges_total", "Hedged LLM requests", ["event"])  # fired, won, skipped
+LLM_HEDGE_SAVED_SECONDS = Counter(
+    "llm_hedge_saved_seconds_total", "Estimated latency saved by hedges that won, from the observed tail"
+)
+LLM_RATE_LIMITED = Counter("llm_rate_limited_total", "429 responses from the LLM provider", ["model"])
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds", "Time LLM calls waited for rate-limit capacity",
+    buckets=(0.01, 0.1, 0.5, 1, 2, 5, 10, 30, 60),
+)
+DOWNLOAD_CACHE = Counter("download_cache_requests_total", "Download cache lookups", ["result"])
+DOWNLOAD_CACHE_BYTES_SAVED = Counter("download_cache_bytes_saved_total", "Bytes served from the download cache")
+QUIZ_RETRIES = Counter("quiz_retries_total", "Quiz hops that did not get a correct answer")
+QUIZ_CHAINS = Counter("quiz_chains_total", "Finished quiz chains", ["status"])
+ACTIVE_TASKS = Gauge("quiz_active_tasks", "Quiz chains currently being processed")
+BROWSER_CONTEXTS = Gauge("browser_pool_active_contexts", "Browser contexts currently checked out")
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Record the duration of the enclosed block under `stage` (and as a trace span)"""
+    start = time.perf_counter()
+    try:
+        with tracing.span(stage):
+            yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """Decorator form of stage_timer for sync and async functions"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def track_active(func):
+    """Count an async function's in-flight calls in ACTIVE_TASKS"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        ACTIVE_TASKS.inc()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            ACTIVE_TASKS.dec()
+    return wrapper
+
+
+def record_llm_usage(message):
+    """Add the token counts of an LLM response, if it reports any"""
+    usage = getattr(message, "usage", None)
+    if usage is None:
+        return
+    prompt = getattr(usage, "input_tokens", None) or getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "output_tokens", None) or getattr(usage, "completion_tokens", None)
+    if prompt:
+        LLM_TOKENS.labels("prompt").inc(prompt)
+    if completion:
+        LLM_TOKENS.labels("completion").inc(completion)
+
+
+def render() -> tuple:
+    """Return (body, content_type) for the /metrics endpoint"""
+    return generate_latest(), CONTENT_TYPE_LATEST
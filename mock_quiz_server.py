@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Local mock quiz server for offline development and benchmarking
+
+Serves a chain of quiz pages whose answers are deterministic, so a stub LLM
+can answer them without any network access. Run standalone with:
+
+    python mock_quiz_server.py --port 8765 --chain-length 5 --js-ratio 0.3
+"""
+
+import re
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+from types import SimpleNamespace
+from typing import Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, Response, JSONResponse
+
+DEFAULT_SETTINGS = {
+    "chain_length": 5,
+    "js_ratio": 0.0,        # share of pages rendered client-side (needs the browser)
+    "base64_ratio": 0.5,    # share of static pages that hide the instruction in atob()
+    "pdf_ratio": 0.3,       # share of quizzes whose attachment is a PDF instead of CSV
+    "latency_ms": 0,        # max random latency added to every response
+    "failure_rate": 0.0,    # probability of answering with HTTP 500
+    "rows": 200,            # rows in each generated attachment
+}
+
+
+def attachment_values(quiz_id: int, rows: int) -> list:
+    """Deterministic integers in quiz `quiz_id`'s attachment"""
+    rng = random.Random(quiz_id)
+    return [rng.randint(1, 1000) for _ in range(rows)]
+
+
+def expected_answer(quiz_id: int, rows: int = DEFAULT_SETTINGS["rows"]) -> int:
+    """Correct answer for a quiz: the sum of its attachment values"""
+    return sum(attachment_values(quiz_id, rows))
+
+
+def quiz_kind(quiz_id: int, settings: dict) -> dict:
+    """Decide how a quiz page and its attachment are delivered"""
+    rng = random.Random(f"kind-{quiz_id}")
+    rendering = "static"
+    if rng.random() < settings["js_ratio"]:
+        rendering = "js"
+    elif rng.random() < settings["base64_ratio"]:
+        rendering = "base64"
+    attachment = "pdf" if rng.random() < settings["pdf_ratio"] else "csv"
+    return {"rendering": rendering, "attachment": attachment}
+
+
+def build_pdf(lines: list) -> bytes:
+    """Build a minimal single-page PDF with one line of text per entry"""
+    text_ops = ["BT", "/F1 9 Tf", "40 800 Td", "11 TL"]
+    for line in lines:
+        escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        text_ops.append(f"({escaped}) Tj T*")
+    text_ops.append("ET")
+    stream = "\n".join(text_ops).encode("latin-1")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def create_app(**overrides) -> FastAPI:
+    """Build the mock quiz app; keyword arguments override DEFAULT_SETTINGS"""
+    settings = {**DEFAULT_SETTINGS, **overrides}
+    app = FastAPI(title="Mock Quiz Server")
+    app.state.settings = settings
+
+    async def simulate_network() -> Optional[Response]:
+        if settings["latency_ms"]:
+            await asyncio.sleep(random.uniform(0, settings["latency_ms"]) / 1000)
+        if random.random() < settings["failure_rate"]:
+            return JSONResponse({"error": "Injected failure"}, status_code=500)
+        return None
+
+    @app.get("/quiz/{quiz_id}", response_class=HTMLResponse)
+    async def quiz_page(quiz_id: int, request: Request):
+        failure = await simulate_network()
+        if failure:
+            return failure
+
+        base = str(request.base_url).rstrip("/")
+        kind = quiz_kind(quiz_id, settings)
+        instruction = (
+            f"Q{quiz_id}. Download <a href=\"{base}/files/{quiz_id}.{kind['attachment']}\">the file</a> "
+            f"and calculate the sum of the value column. Submit to {base}/submit"
+        )
+
+        if kind["rendering"] == "static":
+            body = f'<div id="result">{instruction}</div>'
+        elif kind["rendering"] == "base64":
+            encoded = base64.b64encode(instruction.encode()).decode()
+            body = (
+                '<div id="result"></div>\n'
+                f'<script>document.querySelector("#result").innerHTML = atob(`{encoded}`);</script>'
+            )
+        else:
+            # Assembled at runtime so only a real browser sees the instruction
+            parts = [instruction[i:i + 20] for i in range(0, len(instruction), 20)]
+            body = (
+                '<div id="result"></div>\n'
+                f"<script>setTimeout(() => {{ document.querySelector('#result').innerHTML = "
+                f"{json.dumps(parts)}.join(''); }}, 50);</script>"
+            )
+        return f"<html><head><title>Quiz {quiz_id}</title></head><body>{body}</body></html>"
+
+    @app.get("/files/{quiz_id}.csv")
+    async def csv_file(quiz_id: int):
+        failure = await simulate_network()
+        if failure:
+            return failure
+        values = attachment_values(quiz_id, settings["rows"])
+        lines = ["id,value"] + [f"{i},{v}" for i, v in enumerate(values)]
+        return Response("\n".join(lines) + "\n", media_type="text/csv")
+
+    @app.get("/files/{quiz_id}.pdf")
+    async def pdf_file(quiz_id: int):
+        failure = await simulate_network()
+        if failure:
+            return failure
+        values = attachment_values(quiz_id, settings["rows"])
+        lines = ["id value"] + [f"{i} {v}" for i, v in enumerate(values)]
+        return Response(build_pdf(lines), media_type="application/pdf")
+
+    @app.post("/submit")
+    async def submit(request: Request):
+        failure = await simulate_network()
+        if failure:
+            return failure
+
+        payload = await request.json()
+        quiz_id = int(str(payload.get("url", "")).rstrip("/").rsplit("/", 1)[-1])
+        correct = payload.get("answer") == expected_answer(quiz_id, settings["rows"])
+        base = str(request.base_url).rstrip("/")
+        next_url = f"{base}/quiz/{quiz_id + 1}" if quiz_id < settings["chain_length"] else None
+        response = {"correct": correct, "url": next_url}
+        if not correct:
+            response["reason"] = "Wrong answer"
+        return response
+
+    return app
+
+
+class StubLLMClient:
+    """Stands in for the Groq client, answering mock quizzes after a delay"""
+
+    def __init__(self, latency_ms: float = 0, wrong_rate: float = 0.0,
+                 rows: int = DEFAULT_SETTINGS["rows"]):
+        self.latency_ms = latency_ms
+        self.wrong_rate = wrong_rate
+        self.rows = rows
+        self.messages = self
+        self.calls = 0
+
+    def _answer(self, messages: list, system: str = ""):
+        self.calls += 1
+        if "query plan" in system:
+            # Every mock question is the sum of the attachment's value column
+            plan = '{"aggregate": {"column": "value", "func": "sum"}}'
+            return SimpleNamespace(content=[SimpleNamespace(text=plan)])
+        content = messages[-1]["content"]
+        match = re.search(r"Q(\d+)\.", content)
+        answer = expected_answer(int(match.group(1)), self.rows) if match else 0
+        if random.random() < self.wrong_rate:
+            answer += 1
+        return SimpleNamespace(content=[SimpleNamespace(text=str(answer))])
+
+    def create(self, messages: list, system: str = "", **kwargs):
+        time.sleep(random.uniform(0, self.latency_ms) / 1000)
+        return self._answer(messages, system)
+
+
+class AsyncStubLLMClient(StubLLMClient):
+    """Async variant of StubLLMClient"""
+
+    async def create(self, messages: list, system: str = "", **kwargs):
+        await asyncio.sleep(random.uniform(0, self.latency_ms) / 1000)
+        return self._answer(messages, system)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the mock quiz server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for name, default in DEFAULT_SETTINGS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+    uvicorn.run(create_app(**args), host=host, port=port)
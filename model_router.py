@@ -0,0 +1,56 @@
+"""
+Per-question model selection
+
+Cheap local heuristics classify an instruction as a lookup, arithmetic,
+open reasoning, or a long-context question, and each class maps to a model
+and reply size in config.MODEL_ROUTES. Answers rejected by the submit
+endpoint are retried once with the strong model.
+"""
+
+import re
+
+import config
+import metrics
+import prompt_builder
+
+REASONING = re.compile(
+    r"\b(why|explain|reason|compare|predict|infer|interpret|trend|correlat\w*|regress\w*|"
+    r"forecast|classif\w*|best|recommend|justify|summari[sz]e|analy[sz]e)\b"
+)
+ARITHMETIC = re.compile(
+    r"\b(sum|total|average|mean|median|mode|count|how many|percent\w*|ratio|difference|"
+    r"calculate|compute|multiply|divide|max(imum)?|min(imum)?|std|variance|round\w*)\b|\d\s*[-+*/^]\s*\d"
+)
+
+
+def classify(instruction: str, data_tokens: int = 0) -> str:
+    """One of "extraction", "arithmetic", "reasoning", "long_context".
+
+    "long_context" is chosen when the data would have to be summarised for
+    the fast model and GROQ_MODEL has room for more of it.
+    """
+    fast_room = prompt_builder.data_budget(config.FAST_MODEL, config.MODEL_ROUTES["arithmetic"]["max_tokens"])
+    long_room = prompt_builder.data_budget(config.GROQ_MODEL, config.MODEL_ROUTES["long_context"]["max_tokens"])
+    if data_tokens > fast_room and long_room > fast_room:
+        return "long_context"
+    text = instruction.lower()
+    if REASONING.search(text):
+        return "reasoning"
+    if ARITHMETIC.search(text):
+        return "arithmetic"
+    return "extraction"
+
+
+def route(instruction: str, data_tokens: int = 0, escalate: bool = False) -> dict:
+    """Model and max_tokens for a question; `escalate` moves to STRONG_MODEL.
+
+    The caller fits the data to the chosen model's budget
+    (prompt_builder.data_budget), so any route is safe for any data size.
+    """
+    question_class = classify(instruction, data_tokens)
+    choice = dict(config.MODEL_ROUTES[question_class])
+    if escalate:
+        choice["model"] = config.STRONG_MODEL
+        choice["max_tokens"] = max(choice["max_tokens"], 1024)
+    metrics.MODEL_ROUTES.labels(question_class, choice["model"]).inc()
+    return choice
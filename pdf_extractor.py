@@ -0,0 +1,213 @@
+"""
+PDF text extraction in a process pool, split into page ranges
+"""
+
+import io
+import os
+import re
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Union, BinaryIO
+import pandas as pd
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+import config
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=config.PDF_WORKERS)
+    return _pool
+
+
+def shutdown():
+    """Stop the worker processes (called from the app lifespan)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _open_reader(source: Union[str, bytes]):
+    from pypdf import PdfReader
+    return PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def _page_count(source: Union[str, bytes]) -> int:
+    return len(_open_reader(source).pages)
+
+
+def _extract_pages(source: Union[str, bytes], pages: List[int]) -> List[str]:
+    """Worker: extract the text of the given zero-based pages"""
+    reader = _open_reader(source)
+    texts = []
+    for number in pages:
+        try:
+            texts.append(reader.pages[number].extract_text() or "")
+        except Exception as e:
+            print(f"Error extracting PDF page {number + 1}: {e}")
+            texts.append("")
+    return texts
+
+
+NUMBER_CELL = re.compile(r"^[-+(]?[$€£]?\d[\d,]*(\.\d+)?%?\)?$")
+# First cell of a footer row that aggregates the rows above it
+TOTAL_CELL = re.compile(r"^(grand\s+)?(sub\s*-?\s*)?(totals?|sum)\b", re.IGNORECASE)
+
+
+def _split_cells(line: str) -> tuple:
+    """(mode, cells): split on tabs/wide gaps when present, else on single spaces"""
+    cells = re.split(r"\t|\s{2,}", line.strip())
+    if len(cells) >= 2:
+        return "wide", cells
+    return "narrow", line.split()
+
+
+def _text_tables(text: str) -> List[List[List[str]]]:
+    """Find runs of 3+ lines that split the same way into the same number
+    (2+) of cells; rows after the first must contain a number. Total,
+    subtotal and sum rows are dropped so they are not aggregated again."""
+    tables, run, run_mode = [], [], None
+    for line in text.splitlines() + [""]:
+        mode, cells = _split_cells(line) if line.strip() else (None, [])
+        fits = (
+            len(cells) >= 2 and run and mode == run_mode and len(cells) == len(run[0])
+            and any(NUMBER_CELL.match(cell) for cell in cells)
+        )
+        if fits:
+            run.append(cells)
+            continue
+        if len(run) >= 3:
+            tables.append(run[:1] + [row for row in run[1:] if not TOTAL_CELL.match(row[0].strip())])
+        run, run_mode = ([cells], mode) if len(cells) >= 2 else ([], None)
+    return tables
+
+
+def _extract_tables(source: Union[str, bytes], pages: List[int]) -> List[tuple]:
+    """Worker: (page, rows) for each table found on the given zero-based pages.
+
+    Uses pdfplumber's ruling-line detection when it is installed and finds
+    something, otherwise column-aligned runs in the page text.
+    """
+    found = []
+    plumber = None
+    if pdfplumber is not None:
+        plumber = pdfplumber.open(source if isinstance(source, str) else io.BytesIO(source))
+    try:
+        reader = _open_reader(source)
+        for number in pages:
+            tables = []
+            if plumber is not None:
+                tables = [
+                    [[cell or "" for cell in row] for row in table]
+                    for table in plumber.pages[number].extract_tables()
+                    if len(table) >= 2
+                ]
+            if not tables:
+                tables = _text_tables(reader.pages[number].extract_text() or "")
+            found.extend((number, rows) for rows in tables)
+    finally:
+        if plumber is not None:
+            plumber.close()
+    return found
+
+
+def _numeric(column: pd.Series) -> pd.Series:
+    """Parse a text column as numbers when nearly all cells are numeric"""
+    cleaned = column.astype(str).str.replace(r"[,$€£%\s]", "", regex=True)
+    parsed = pd.to_numeric(cleaned, errors="coerce")
+    non_empty = cleaned.ne("").sum()
+    if non_empty and parsed.notna().sum() >= 0.8 * non_empty:
+        return parsed
+    return column
+
+
+def table_to_frame(rows: List[List[str]], page: Optional[int] = None) -> pd.DataFrame:
+    """Build a typed DataFrame, using the first row as header if it is not numeric"""
+    width = max(len(row) for row in rows)
+    rows = [list(row) + [""] * (width - len(row)) for row in rows]
+    header = rows[0]
+    if all(pd.isna(pd.to_numeric(cell.replace(",", ""), errors="coerce")) for cell in header if cell):
+        columns = [cell.strip() or f"column_{i}" for i, cell in enumerate(header)]
+        rows = rows[1:]
+    else:
+        columns = [f"column_{i}" for i in range(width)]
+    df = pd.DataFrame(rows, columns=columns)
+    for name in df.columns:
+        df[name] = _numeric(df[name])
+    df.attrs["page"] = page
+    return df
+
+
+def _portable_source(pdf: Union[bytes, BinaryIO]) -> Union[str, bytes]:
+    """Something that can be sent to a worker: a path when the file is on disk, else bytes"""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return bytes(pdf)
+    name = getattr(pdf, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    pdf.seek(0)
+    return pdf.read()
+
+
+def requested_pages(text: str) -> Optional[List[int]]:
+    """Zero-based pages named in a question ("page 2", "pages 3-5"), or None for all"""
+    pages = []
+    for start, end in re.findall(r"\bpages?\s+(\d+)(?:\s*(?:-|to|–)\s*(\d+))?", text, re.IGNORECASE):
+        first = int(start)
+        last = int(end) if end else first
+        pages.extend(range(first - 1, last))
+    return sorted(set(p for p in pages if p >= 0)) or None
+
+
+async def _run_chunks(pdf: Union[bytes, BinaryIO], pages: Optional[List[int]], worker) -> list:
+    """Run `worker(source, page_chunk)` over the wanted pages in the pool and
+    concatenate the per-chunk results in page order"""
+    source = _portable_source(pdf)
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+
+    count = await loop.run_in_executor(pool, _page_count, source)
+    wanted = [p for p in (pages if pages is not None else range(count)) if 0 <= p < count]
+    size = config.PDF_PAGES_PER_TASK
+    chunks = [wanted[i:i + size] for i in range(0, len(wanted), size)]
+
+    results = await asyncio.gather(
+        *(loop.run_in_executor(pool, worker, source, chunk) for chunk in chunks)
+    )
+    return [item for chunk in results for item in chunk]
+
+
+async def extract_pages(pdf: Union[bytes, BinaryIO], pages: Optional[List[int]] = None) -> List[str]:
+    """Extract per-page text, in parallel chunks of PDF_PAGES_PER_TASK pages.
+
+    Only `pages` (zero-based) are extracted when given; out-of-range pages are
+    skipped. Returns one string per extracted page, in page order.
+    """
+    return await _run_chunks(pdf, pages, _extract_pages)
+
+
+async def extract_tables(pdf: Union[bytes, BinaryIO], pages: Optional[List[int]] = None) -> List[pd.DataFrame]:
+    """Detect tables on the given zero-based pages and return typed DataFrames.
+
+    Each frame's attrs["page"] holds the zero-based page it came from.
+    """
+    found = await _run_chunks(pdf, pages, _extract_tables)
+    return [table_to_frame(rows, page) for page, rows in found]
+
+
+def merge_tables(tables: List[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    """Concatenate tables sharing the same columns (e.g. one table split
+    across pages) and return the largest result"""
+    groups = {}
+    for df in tables:
+        groups.setdefault(tuple(df.columns), []).append(df)
+    merged = [pd.concat(group, ignore_index=True) for group in groups.values()]
+    return max(merged, key=len) if merged else None
@@ -0,0 +1,175 @@
+"""
+Token-budgeted prompts for free-form data analysis
+
+Data that fits the budget is sent as-is. Larger tables are replaced by their
+schema, per-column statistics and the rows that best match the question;
+larger text by the snippets that best match it, in their original order.
+"""
+
+import io
+import re
+import csv
+import math
+from typing import Dict, List, Optional, Set
+import pandas as pd
+
+import config
+
+# Rough chars-per-token for English text and numbers under Mixtral/Llama
+# style tokenizers; deliberately conservative so prompts stay under the window
+CHARS_PER_TOKEN = 3.5
+SNIPPET_CHARS = 1000  # size of the text windows ranked against the question
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "what", "which", "with", "this", "that",
+    "from", "how", "many", "much", "does", "have", "has", "all", "any", "its",
+    "into", "your", "you", "submit", "answer", "please", "find", "give", "value",
+}
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (no tokenizer for the Groq models is available offline)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def question_terms(question: str) -> Set[str]:
+    """Lower-cased words and numbers from the question that are worth matching"""
+    words = re.findall(r"[a-z0-9][a-z0-9_.-]*", question.lower())
+    return {w.strip(".-") for w in words if (len(w) > 2 or w.isdigit()) and w not in STOPWORDS}
+
+
+def term_weights(chunks: List[str], terms: Set[str]) -> Dict[str, float]:
+    """IDF-style weights: terms found in fewer chunks count for more"""
+    lowered = [chunk.lower() for chunk in chunks]
+    weights = {}
+    for term in terms:
+        found = sum(1 for chunk in lowered if term in chunk)
+        if found:
+            weights[term] = math.log((len(chunks) + 1) / found)
+    return weights
+
+
+def overlap(text: str, weights: Dict[str, float]) -> float:
+    """Weighted count of the question terms appearing in text"""
+    lowered = text.lower()
+    return sum(weight for term, weight in weights.items() if term in lowered)
+
+
+def rank(chunks: List[str], question: str) -> List[int]:
+    """Chunk indices, best match for the question first (ties keep document order)"""
+    weights = term_weights(chunks, question_terms(question))
+    scores = [overlap(chunk, weights) for chunk in chunks]
+    return sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+
+
+def _as_table(data: str) -> Optional[pd.DataFrame]:
+    """Parse data as a delimited table if its first lines split consistently"""
+    lines = data.strip().splitlines()
+    if len(lines) < 5:
+        return None
+    head = "\n".join(lines[:20])
+    try:
+        dialect = csv.Sniffer().sniff(head, delimiters=",;\t|")
+    except csv.Error:
+        return None
+    widths = {len(row) for row in csv.reader(io.StringIO(head), dialect)}
+    if len(widths) != 1 or widths.pop() < 2:
+        return None
+    try:
+        return pd.read_csv(io.StringIO(data.strip()), sep=dialect.delimiter)
+    except Exception:
+        return None
+
+
+def _column_summary(name: str, column: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(column):
+        counts = column.value_counts()
+        return f"- {name} (bool): {counts.get(True, 0)} true, {counts.get(False, 0)} false"
+    if pd.api.types.is_any_real_numeric_dtype(column):
+        # float() because the reductions may return NumPy or nullable scalars
+        stats = [float(value) for value in (column.sum(), column.mean(), column.min(), column.max())]
+        return (
+            f"- {name} ({column.dtype}): count={column.count()}, sum={stats[0]:g}, "
+            f"mean={stats[1]:g}, min={stats[2]:g}, max={stats[3]:g}"
+        )
+    top = column.astype(str).value_counts().head(5)
+    values = ", ".join(f"{value} ({count})" for value, count in top.items())
+    return f"- {name} (text): {column.nunique()} distinct; most common: {values}"
+
+
+def summarise_frame(df: pd.DataFrame, question: str, budget: int) -> str:
+    """Schema, column statistics and question-relevant sample rows within budget tokens"""
+    parts = [f"Table with {len(df)} rows (summarised; not all rows shown)", "Columns:"]
+    parts += [_column_summary(str(name), column) for name, column in df.items()]
+    summary = "\n".join(parts)
+
+    lines = df.to_csv(index=False).splitlines()
+    header, rows = lines[0], lines[1:]
+    remaining = budget - count_tokens(summary) - count_tokens(header) - 10
+    chosen = []
+    for i in rank(rows, question):
+        cost = count_tokens(rows[i]) + 1
+        if cost > remaining:
+            break
+        chosen.append(i)
+        remaining -= cost
+    sample = "\n".join([header] + [rows[i] for i in sorted(chosen)])
+    return f"{summary}\n\nSample rows ({len(chosen)} of {len(rows)}):\n{sample}"
+
+
+def _windows(text: str) -> List[str]:
+    """Split text into runs of whole lines of about SNIPPET_CHARS characters"""
+    windows, current, size = [], [], 0
+    for line in text.splitlines():
+        while len(line) > SNIPPET_CHARS:
+            # Minified or single-line content
+            windows.append(line[:SNIPPET_CHARS])
+            line = line[SNIPPET_CHARS:]
+        if current and size + len(line) > SNIPPET_CHARS:
+            windows.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        windows.append("\n".join(current))
+    return windows
+
+
+def relevant_snippets(text: str, question: str, budget: int) -> str:
+    """The windows of text that best match the question, in document order,
+    within budget tokens"""
+    windows = _windows(text)
+    remaining, chosen = budget, []
+    for i in rank(windows, question):
+        cost = count_tokens(windows[i]) + 2
+        if cost > remaining:
+            continue
+        chosen.append(i)
+        remaining -= cost
+    return "\n...\n".join(windows[i] for i in sorted(chosen))
+
+
+def fit_data(data: str, question: str, budget: int) -> str:
+    """Return data unchanged if it fits in budget tokens, else a summary that does"""
+    if count_tokens(data) <= budget:
+        return data
+    df = _as_table(data)
+    if df is not None and not df.empty:
+        return summarise_frame(df, question, budget)
+    return relevant_snippets(data, question, budget)
+
+
+def prompt_limit(model: str) -> int:
+    """Most tokens (prompt plus reply) one request to model may use: its
+    context window, and its tokens-per-minute limit, which no single request
+    can exceed (see llm_limiter)"""
+    window = config.MODEL_CONTEXT_TOKENS.get(model, config.MODEL_DEFAULT_CONTEXT_TOKENS)
+    limit = min(window, config.LLM_PROMPT_TOKEN_BUDGET)
+    tpm = config.LLM_RATE_LIMITS.get(model, config.LLM_DEFAULT_RATE_LIMIT).get("tpm")
+    return min(limit, tpm) if tpm else limit
+
+
+def data_budget(model: str, max_tokens: int, *fixed: str) -> int:
+    """Tokens left for data in a request to model, after the fixed parts of
+    the prompt and a reply of up to max_tokens"""
+    used = sum(count_tokens(part) for part in fixed)
+    return max(0, prompt_limit(model) - max_tokens - used)
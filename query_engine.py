@@ -0,0 +1,226 @@
+"""
+Local execution of LLM-written query plans over tabular data
+
+Instead of sending a whole file to the model and asking it to do arithmetic,
+the model sees only the schema and a few sample rows and returns a small JSON
+plan, which is executed here with vectorized pandas operations.
+"""
+
+import re
+import json
+import math
+import datetime
+from typing import Any, Optional
+import numpy as np
+import pandas as pd
+
+FILTER_OPS = {"==", "!=", ">", ">=", "<", "<=", "in", "not in", "contains"}
+AGGREGATES = {"sum", "mean", "median", "min", "max", "count", "nunique", "std"}
+
+PLAN_SYSTEM_PROMPT = """You translate data questions into query plans.
+Reply with ONLY a JSON object of this shape (omit keys you do not need):
+{"filters": [{"column": "<name>", "op": "==|!=|>|>=|<|<=|in|not in|contains", "value": <value>}],
+ "group_by": ["<name>"],
+ "aggregate": {"column": "<name>", "func": "sum|mean|median|min|max|count|nunique|std"},
+ "sort": {"column": "<name>", "descending": true},
+ "limit": <int>,
+ "select": ["<name>"]}
+Use only the listed column names. If the question cannot be answered from the
+table, reply with {"unsupported": true}."""
+
+
+class PlanError(ValueError):
+    """Raised when a query plan is malformed or references unknown columns"""
+
+
+def describe_frame(df: pd.DataFrame, sample_rows: int = 5, rows: Optional[int] = None) -> str:
+    """Schema and a few sample rows, small enough for any prompt.
+
+    `rows` overrides the row count when df is only a sample of the table.
+    """
+    columns = "\n".join(f"- {name} ({dtype})" for name, dtype in df.dtypes.items())
+    sample = df.head(sample_rows).to_csv(index=False)
+    count = len(df) if rows is None else f"about {rows}"
+    return f"Rows: {count}\nColumns:\n{columns}\n\nSample rows:\n{sample}"
+
+
+def plan_request_content(question: str, df: pd.DataFrame, rows: Optional[int] = None) -> str:
+    """User message asking the model for a plan"""
+    return f"Table:\n{describe_frame(df, rows=rows)}\nQuestion: {question}"
+
+
+def parse_plan(text: str) -> dict:
+    """Extract the JSON plan from a model response"""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        raise PlanError("No JSON object in plan response")
+    try:
+        plan = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        raise PlanError(f"Invalid plan JSON: {e}")
+    if not isinstance(plan, dict):
+        raise PlanError("Plan must be a JSON object")
+    if plan.get("unsupported"):
+        raise PlanError("Model reported the question is not answerable from the table")
+    return plan
+
+
+def _column(df: pd.DataFrame, name: Any) -> str:
+    if name in df.columns:
+        return name
+    # Models often change case or spacing of column names
+    lookup = {str(c).strip().lower(): c for c in df.columns}
+    key = str(name).strip().lower()
+    if key in lookup:
+        return lookup[key]
+    raise PlanError(f"Unknown column: {name}")
+
+
+def _filter_mask(df: pd.DataFrame, condition: dict) -> pd.Series:
+    column = df[_column(df, condition.get("column"))]
+    op = condition.get("op", "==")
+    value = condition.get("value")
+    if op not in FILTER_OPS:
+        raise PlanError(f"Unsupported filter op: {op}")
+    if op == "contains":
+        return column.astype(str).str.contains(str(value), case=False, na=False, regex=False)
+    if op in ("in", "not in"):
+        values = value if isinstance(value, list) else [value]
+        mask = column.isin(values)
+        return ~mask if op == "not in" else mask
+    if isinstance(column.dtype, pd.CategoricalDtype) and op not in ("==", "!="):
+        # Unordered categoricals (from sniffed dtypes) cannot be compared with < or >
+        column = column.astype(object)
+    if pd.api.types.is_numeric_dtype(column) and isinstance(value, str):
+        value = pd.to_numeric(value, errors="coerce")
+    return {
+        "==": column.__eq__, "!=": column.__ne__,
+        ">": column.__gt__, ">=": column.__ge__,
+        "<": column.__lt__, "<=": column.__le__,
+    }[op](value)
+
+
+def _to_python(value: Any) -> Any:
+    """Convert NumPy/pandas results to plain JSON-friendly Python values:
+    missing values become None and timestamps ISO 8601 strings"""
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+        if value is pd.NaT:
+            return None
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        value = float(value)
+        if math.isnan(value):
+            return None
+        return int(value) if value.is_integer() else value
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def plan_columns(plan: dict) -> list:
+    """Every column name a plan refers to"""
+    names = [c.get("column") for c in plan.get("filters") or []]
+    names += list(plan.get("group_by") or [])
+    names.append((plan.get("aggregate") or {}).get("column"))
+    if not (plan.get("aggregate") or plan.get("group_by")):
+        # Aggregated results are sorted by value, whatever column the plan names
+        names.append((plan.get("sort") or {}).get("column"))
+    names += list(plan.get("select") or [])
+    return [n for n in dict.fromkeys(names) if n not in (None, "*")]
+
+
+def resolve_columns(df: pd.DataFrame, names: list) -> list:
+    """Map plan column names to df's actual column names"""
+    return list(dict.fromkeys(_column(df, name) for name in names))
+
+
+def apply_filters(df: pd.DataFrame, plan: dict) -> pd.DataFrame:
+    """Keep the rows matching every filter in the plan"""
+    filters = plan.get("filters") or []
+    if not filters:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    for condition in filters:
+        mask &= _filter_mask(df, condition).to_numpy(dtype=bool)
+    return df[mask]
+
+
+def execute_plan(df: pd.DataFrame, plan: dict) -> Any:
+    """Run a plan against df and return a scalar, dict or list of records"""
+    df = apply_filters(df, plan)
+
+    group_by = [_column(df, c) for c in plan.get("group_by") or []]
+    aggregate = plan.get("aggregate")
+    result: Any = df
+
+    if aggregate:
+        func = aggregate.get("func", "sum")
+        if func not in AGGREGATES:
+            raise PlanError(f"Unsupported aggregate: {func}")
+        target = aggregate.get("column")
+        if target in (None, "*") and func == "count":
+            result = df.groupby(group_by, observed=True).size() if group_by else len(df)
+        else:
+            column = _column(df, target)
+            series = df[column]
+            if func not in ("count", "nunique") and not pd.api.types.is_numeric_dtype(series):
+                series = pd.to_numeric(series, errors="coerce")
+            if group_by:
+                result = series.groupby([df[c] for c in group_by], observed=True).agg(func)
+            else:
+                result = series.agg(func)
+    elif group_by:
+        result = df.groupby(group_by, observed=True).size()
+
+    return shape_result(result, plan)
+
+
+def shape_result(result: Any, plan: dict) -> Any:
+    """Apply the plan's sort/limit/select and convert to plain Python values"""
+    sort = plan.get("sort")
+    limit = plan.get("limit")
+    if isinstance(result, pd.Series):
+        if sort:
+            result = result.sort_values(ascending=not sort.get("descending", False))
+        if limit:
+            result = result.head(int(limit))
+        return {str(_to_python(k)): _to_python(v) for k, v in result.items()}
+
+    if isinstance(result, pd.DataFrame):
+        if sort:
+            result = result.sort_values(_column(result, sort.get("column")),
+                                        ascending=not sort.get("descending", False))
+        if limit:
+            result = result.head(int(limit))
+        select = plan.get("select")
+        if select:
+            result = result[[_column(result, c) for c in select]]
+        if result.shape == (1, 1):
+            return _to_python(result.iat[0, 0])
+        return [{k: _to_python(v) for k, v in row.items()} for row in result.to_dict("records")]
+
+    return _to_python(result)
+
+
+class PlanAnswer:
+    """A result computed locally from a query plan: already the exact, typed
+    answer, so it is submitted as-is rather than parsed back out of text"""
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return format_result(self.value)
+
+
+def format_result(result: Any) -> str:
+    """Render a plan result as the text parse_answer expects"""
+    if isinstance(result, (dict, list)):
+        return json.dumps(result)
+    return str(result)
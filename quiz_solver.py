@@ -3,20 +3,70 @@ Advanced quiz solver utilities for handling complex data tasks
 """
 
 import re
+import ast
 import json
 import base64
 import io
-import requests
+import time
+import hashlib
+import tempfile
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from typing import Optional, Any, List
+from typing import Optional, Any, List, Callable, Union, BinaryIO
 from groq import Groq
 
+try:
+    from groq import AsyncGroq
+except ImportError:
+    AsyncGroq = None
+
+import config
+from llm_cache import LLMCache, make_key
+from scheduler import LatencyTracker, HedgeBudget
+from llm_limiter import LLMRateLimiter, is_rate_limited, retry_after, usage_tokens
+from download_cache import DownloadCache, cache_key
+
+import http_client
+import metrics
+import query_engine
+import csv_ingest
+import data_loader
+import prompt_builder
+import model_router
+import pdf_extractor
+
+# Collects the cache keys of the LLM completions made inside recording_cache_keys()
+_cache_keys: ContextVar[Optional[set]] = ContextVar("llm_cache_keys", default=None)
+
+
+@contextmanager
+def recording_cache_keys(keys: set):
+    """Add the cache key of every completion made inside the block
+    (also in tasks it starts) to `keys`, so a rejected answer can be
+    dropped from the cache with LLMCache.invalidate"""
+    token = _cache_keys.set(keys)
+    try:
+        yield keys
+    finally:
+        _cache_keys.reset(token)
+
+
 class QuizSolver:
     """Advanced quiz solver with multiple task handlers"""
     
     def __init__(self, groq_api_key: str):
         self.groq_api_key = groq_api_key
         self.client = None
+        self.async_client = None
+        self._executor = None
+        self.latencies = LatencyTracker()
+        self.hedge_budget = HedgeBudget()
+        self.rate_limiter = LLMRateLimiter()
+        self.cache = LLMCache()
+        self.download_cache = DownloadCache() if config.DOWNLOAD_CACHE_DIR else None
     
     def get_client(self):
         """Lazy load Groq client"""
@@ -24,79 +74,487 @@ class QuizSolver:
             self.client = Groq(api_key=self.groq_api_key)
         return self.client
     
+    def get_async_client(self):
+        """Lazy load async Groq client, or None if this groq version lacks one"""
+        if self.async_client is None and AsyncGroq is not None:
+            self.async_client = AsyncGroq(api_key=self.groq_api_key)
+        return self.async_client
+    
     def extract_numbers(self, text: str) -> List[float]:
         """Extract all numbers from text"""
         return [float(n) for n in re.findall(r'-?\d+\.?\d*', text)]
     
-    def download_file(self, url: str) -> Optional[bytes]:
-        """Download file from URL"""
+    @metrics.timed("download_file")
+    async def download_to_file_async(self, url: str, max_bytes: int = config.DOWNLOAD_MAX_BYTES,
+                                     progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                                     headers: Optional[dict] = None,
+                                     response_info: Optional[dict] = None) -> Optional[BinaryIO]:
+        """Stream a download into a spooled temp file, rewound and ready to read.
+        
+        The body stays in memory up to DOWNLOAD_SPOOL_BYTES and spills to disk
+        above that. Downloads larger than `max_bytes` or slower than
+        DOWNLOAD_TIMEOUT_SECONDS are abandoned. `progress(received, total)` is
+        called after each chunk; total is None without a Content-Length.
+        `response_info`, if given, receives the response's "content_type".
+        
+        Fresh copies in the download cache are returned without a request;
+        stale ones are revalidated with If-None-Match / If-Modified-Since.
+        Cache access runs in worker threads, off the event loop.
+        """
+        key = cache_key(url, headers)
+        entry = None
+        if self.download_cache is not None:
+            entry = await asyncio.to_thread(self.download_cache.lookup, key)
+        request_headers = dict(headers or {})
+        info = response_info if response_info is not None else {}
+        if entry is not None:
+            info["content_type"] = entry.get("content_type") or ""
+            if entry["expires_at"] > time.time():
+                cached = await self._open_cached(key, entry, "hit")
+                if cached is not None:
+                    return cached
+                entry = None  # evicted since the lookup: a miss
+            else:
+                request_headers.update(self.download_cache.validators(entry))
+        
+        spool = tempfile.SpooledTemporaryFile(max_size=config.DOWNLOAD_SPOOL_BYTES)
+        digest = hashlib.sha256()
+        state = {}
+        
+        async def transfer():
+            async with http_client.stream("GET", url, headers=request_headers, timeout=30) as response:
+                state["headers"] = response.headers
+                if response.status_code == 304 and entry is not None:
+                    state["not_modified"] = True
+                    return
+                response.raise_for_status()
+                info["content_type"] = response.headers.get("content-type", "")
+                length = response.headers.get("content-length")
+                total = int(length) if length and length.isdigit() else None
+                if total is not None and total > max_bytes:
+                    raise ValueError(f"File is {total} bytes, limit is {max_bytes}")
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise ValueError(f"File exceeds {max_bytes} bytes")
+                    spool.write(chunk)
+                    digest.update(chunk)
+                    if progress is not None:
+                        progress(received, total)
+                state["size"] = received
+        
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            return response.content
+            await asyncio.wait_for(transfer(), timeout=config.DOWNLOAD_TIMEOUT_SECONDS)
+            if state.get("not_modified"):
+                await asyncio.to_thread(self.download_cache.refresh, key, state["headers"])
+                cached = await self._open_cached(key, entry, "revalidated")
+                if cached is not None:
+                    spool.close()
+                    return cached
+                # Evicted after the 304: fetch the body without validators
+                entry, request_headers = None, dict(headers or {})
+                state.clear()
+                await asyncio.wait_for(transfer(), timeout=config.DOWNLOAD_TIMEOUT_SECONDS)
+            if self.download_cache is not None:
+                metrics.DOWNLOAD_CACHE.labels("miss").inc()
+                try:
+                    await asyncio.to_thread(
+                        self.download_cache.store, key, spool, digest.hexdigest(), state["size"], state["headers"]
+                    )
+                except Exception as e:
+                    print(f"Error caching download: {e}")
+            spool.seek(0)
+            return spool
         except Exception as e:
+            spool.close()
             print(f"Error downloading file: {e}")
             return None
     
-    def extract_pdf_text(self, pdf_content: bytes) -> str:
+    async def _open_cached(self, key: str, entry: dict, result: str) -> Optional[BinaryIO]:
+        """Open a download cache blob in a worker thread, or None if it is gone"""
+        try:
+            return await asyncio.to_thread(self.download_cache.open, key, entry, result)
+        except OSError as e:
+            print(f"Cached download unavailable, fetching it again: {e}")
+            return None
+    
+    async def download_file_async(self, url: str) -> Optional[bytes]:
+        """Download file from URL"""
+        spool = await self.download_to_file_async(url)
+        if spool is None:
+            return None
+        with spool:
+            return spool.read()
+    
+    def download_file(self, url: str) -> Optional[bytes]:
+        """Download file from URL (blocking, for CLI use)"""
+        return http_client.run_sync(lambda: self.download_file_async(url))
+    
+    def _as_stream(self, content: Union[bytes, BinaryIO]) -> BinaryIO:
+        """Accept raw bytes or an open file such as download_to_file_async returns"""
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return io.BytesIO(content)
+        return content
+    
+    @metrics.timed("extract_pdf_text")
+    def extract_pdf_text(self, pdf_content: Union[bytes, BinaryIO]) -> str:
         """Extract text from PDF"""
         try:
             from pypdf import PdfReader
-            reader = PdfReader(io.BytesIO(pdf_content))
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-            return text
+            reader = PdfReader(self._as_stream(pdf_content))
+            return "".join(page.extract_text() for page in reader.pages)
         except Exception as e:
             print(f"Error extracting PDF: {e}")
             return ""
     
-    def parse_csv_data(self, csv_content: bytes) -> pd.DataFrame:
-        """Parse CSV data"""
+    @metrics.timed("extract_pdf_text")
+    async def extract_pdf_pages_async(self, pdf_content: Union[bytes, BinaryIO],
+                                      pages: Optional[List[int]] = None) -> List[str]:
+        """Extract text per page in the PDF process pool; `pages` are zero-based"""
+        try:
+            return await pdf_extractor.extract_pages(pdf_content, pages)
+        except Exception as e:
+            print(f"Error extracting PDF: {e}")
+            return []
+    
+    @metrics.timed("extract_pdf_tables")
+    async def extract_pdf_tables_async(self, pdf_content: Union[bytes, BinaryIO],
+                                       pages: Optional[List[int]] = None) -> List[pd.DataFrame]:
+        """Detect tables in the PDF and return them as typed DataFrames"""
+        try:
+            return await pdf_extractor.extract_tables(pdf_content, pages)
+        except Exception as e:
+            print(f"Error extracting PDF tables: {e}")
+            return []
+    
+    @metrics.timed("parse_csv_data")
+    def parse_csv_data(self, csv_content: Union[bytes, BinaryIO]) -> pd.DataFrame:
+        """Parse CSV data with the delimiter, encoding and dtypes sniffed from a sample"""
         try:
-            return pd.read_csv(io.BytesIO(csv_content))
+            stream = self._as_stream(csv_content)
+            info = csv_ingest.sniff(stream)
+            if info is None:
+                return pd.DataFrame()
+            return csv_ingest.read_frame(stream, info)
         except Exception as e:
             print(f"Error parsing CSV: {e}")
             return pd.DataFrame()
     
-    def analyze_data(self, query: str, data: str) -> str:
-        """Use Groq to analyze data"""
+    @metrics.timed("load_data")
+    async def open_attachment_async(self, content: Union[bytes, BinaryIO], name: str = "",
+                                    content_type: str = "") -> List[data_loader.Dataset]:
+        """Detect an attachment's format, unwrapping zip/gzip archives, off the event loop"""
+        try:
+            return await asyncio.to_thread(
+                data_loader.open_datasets, self._as_stream(content), name, content_type
+            )
+        except Exception as e:
+            print(f"Error opening attachment {name}: {e}")
+            return []
+    
+    @metrics.timed("load_data")
+    async def load_data_async(self, dataset: data_loader.Dataset) -> Any:
+        """Parse a dataset off the event loop: a DataFrame, structured object or None"""
+        return await asyncio.to_thread(lambda: dataset.value)
+    
+    def _analysis_request(self, query: str, data: str, escalate: bool = False) -> dict:
+        """Build the model request used by analyze_data_async, on the model routed
+        for the question (the strong one when `escalate` is set)"""
         system_prompt = """You are an expert data analyst. 
 Analyze the provided data and answer questions precisely.
 Extract exact values when asked for calculations.
 Return ONLY the final answer without explanations."""
+        route = model_router.route(query, prompt_builder.count_tokens(data), escalate)
+        # Oversized data is replaced by a summary that fits the routed model's window
+        budget = prompt_builder.data_budget(
+            route["model"], route["max_tokens"], system_prompt, query, "Analyze this data: Question:"
+        )
+        data = prompt_builder.fit_data(data, query, budget)
+        
+        return {
+            "model": route["model"],
+            "max_tokens": route["max_tokens"],
+            "system": system_prompt,
+            "messages": [
+                {"role": "user", "content": f"Analyze this data:\n\n{data}\n\nQuestion: {query}"}
+            ],
+        }
+    
+    @metrics.timed("llm_call")
+    async def complete_async(self, request: dict, deadline: Optional[float] = None) -> str:
+        """Send a model request without blocking the event loop, with caching.
+        
+        The call is cancelled after LLM_TIMEOUT_SECONDS or at `deadline`
+        (a time.monotonic() timestamp), whichever comes first. Time spent
+        queued behind the provider's rate limits counts towards both.
+        """
+        key = make_key(request)
+        recorded = _cache_keys.get()
+        if recorded is not None:
+            recorded.add(key)
+        cached = await self.cache.get_async(key)
+        if cached is not None:
+            return cached
+        
+        timeout = config.LLM_TIMEOUT_SECONDS
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            print("Skipping LLM call: deadline already passed")
+            return ""
         
         try:
-            client = self.get_client()
-            message = client.messages.create(
-                model="mixtral-8x7b-32768",
-                max_tokens=2048,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": f"Analyze this data:\n\n{data}\n\nQuestion: {query}"}
-                ]
-            )
-            return message.content[0].text
+            message = await self._hedged_send(request, timeout, deadline)
+            metrics.record_llm_usage(message)
+            text = message.content[0].text
+            await self.cache.set_async(key, text)
+            return text
+        except asyncio.TimeoutError:
+            print(f"LLM call timed out after {timeout:.1f}s")
+            return ""
         except Exception as e:
             print(f"Error analyzing data: {e}")
             return ""
     
-    def call_api(self, url: str, method: str = "GET", headers: dict = None) -> Optional[dict]:
+    def _request_tokens(self, request: dict) -> int:
+        """Tokens a request may use against the provider's limits: prompt plus the full reply"""
+        text = request.get("system", "") + "".join(str(m.get("content", "")) for m in request.get("messages", []))
+        return prompt_builder.count_tokens(text) + request.get("max_tokens", config.LLM_MAX_TOKENS)
+    
+    async def _send_async(self, request: dict, deadline: Optional[float] = None):
+        """One model call, admitted by the rate limiter and timed into the
+        model's latency window. A 429 pauses the model for its Retry-After
+        and the call queues again; the caller's timeout bounds the retries."""
+        model = request.get("model", "")
+        estimate = self._request_tokens(request)
+        while True:
+            async with self.rate_limiter.slot(model, estimate, deadline):
+                start = time.monotonic()
+                try:
+                    message = await self._create_async(request)
+                except Exception as e:
+                    if not is_rate_limited(e):
+                        raise
+                    self.rate_limiter.on_rate_limited(model, retry_after(e))
+                    continue
+                self.rate_limiter.on_success(model)
+                self.rate_limiter.record_usage(model, estimate, usage_tokens(message))
+            self.latencies.record(model, time.monotonic() - start)
+            return message
+    
+    async def _create_async(self, request: dict):
+        client = self.get_async_client()
+        if client is not None:
+            return await client.messages.create(**request)
+        # Fall back to the sync client on a bounded thread pool
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=config.LLM_THREAD_POOL_SIZE)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, lambda: self.get_client().messages.create(**request)
+        )
+    
+    async def _hedged_send(self, request: dict, timeout: float, deadline: Optional[float] = None):
+        """Send a model request; if it is still running at the model's observed
+        p90 (LLM_HEDGE_PERCENTILE), send a duplicate, to LLM_HEDGE_MODEL if set,
+        take whichever answers first and cancel the other. Hedges are capped
+        by self.hedge_budget and are not sent while calls are queueing for
+        rate-limit capacity. Raises asyncio.TimeoutError after `timeout`."""
+        start = time.monotonic()
+        model = request.get("model", "")
+        if deadline is None:
+            deadline = start + timeout
+        self.hedge_budget.on_request()
+        hedge_at = self.latencies.percentile(model, config.LLM_HEDGE_PERCENTILE) if config.LLM_HEDGE else None
+        primary = asyncio.create_task(self._send_async(request, deadline))
+        pending, hedge, error = {primary}, None, None
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= start + timeout:
+                    raise asyncio.TimeoutError()
+                until = start + timeout
+                if hedge is None and hedge_at is not None:
+                    until = min(until, start + hedge_at)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, until - now), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is hedge:
+                        metrics.LLM_HEDGES.labels("won").inc()
+                        # The primary is cancelled: count its time so far as a
+                        # (lower-bound) sample and estimate the rest from the tail
+                        self.latencies.record(model, time.monotonic() - start)
+                        tail = self.latencies.tail_mean(model, config.LLM_HEDGE_PERCENTILE)
+                        if tail is not None:
+                            metrics.LLM_HEDGE_SAVED_SECONDS.inc(max(0.0, tail - (time.monotonic() - start)))
+                    return task.result()
+                if not done and hedge is None and hedge_at is not None and primary in pending:
+                    hedge_request = {**request, "model": config.LLM_HEDGE_MODEL or model}
+                    spare = self.rate_limiter.has_capacity(
+                        hedge_request["model"], self._request_tokens(hedge_request)
+                    )
+                    if spare and self.hedge_budget.try_acquire():
+                        metrics.LLM_HEDGES.labels("fired").inc()
+                        hedge = asyncio.create_task(self._send_async(hedge_request, deadline))
+                        pending.add(hedge)
+                    else:
+                        metrics.LLM_HEDGES.labels("skipped").inc()
+                        hedge_at = None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    @metrics.timed("analyze_data")
+    async def analyze_data_async(self, query: str, data: str, deadline: Optional[float] = None,
+                                 escalate: bool = False) -> str:
+        """Use Groq to analyze data without blocking the event loop"""
+        # Fitting large data to the prompt budget is pandas work; keep it off the loop
+        request = await asyncio.to_thread(self._analysis_request, query, data, escalate)
+        return await self.complete_async(request, deadline)
+    
+    def _vote_key(self, answer: Any) -> str:
+        """Normalise a parsed answer so equivalent answers get the same vote"""
+        if isinstance(answer, float):
+            answer = round(answer, 6)
+        if isinstance(answer, str):
+            return answer.strip().lower()
+        return json.dumps(answer, sort_keys=True, default=str)
+    
+    @metrics.timed("consensus")
+    async def analyze_data_consensus(self, query: str, data: str, instruction: str,
+                                     deadline: Optional[float] = None,
+                                     candidates: int = config.CONSENSUS_CANDIDATES,
+                                     quorum: int = config.CONSENSUS_QUORUM,
+                                     escalate: bool = False) -> str:
+        """Race `candidates` analyses with different temperatures/models and
+        return a response whose parsed answer won the vote.
+        
+        Returns as soon as `quorum` candidates agree, cancelling the rest;
+        otherwise the most common answer wins, ties going to the earliest.
+        """
+        base = await asyncio.to_thread(self._analysis_request, query, data, escalate)
+        models = config.CONSENSUS_MODELS or [base["model"]]
+        requests = [
+            {
+                **base,
+                "model": models[i % len(models)],
+                "temperature": config.CONSENSUS_TEMPERATURES[i % len(config.CONSENSUS_TEMPERATURES)],
+            }
+            for i in range(candidates)
+        ]
+        tasks = [asyncio.create_task(self.complete_async(request, deadline)) for request in requests]
+        votes = {}  # vote key -> responses, in order of arrival
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                response = await next_done
+                if not response:
+                    continue
+                key = self._vote_key(self.parse_answer(response, instruction))
+                votes.setdefault(key, []).append(response)
+                if len(votes[key]) >= min(quorum, candidates) and candidates > 1:
+                    metrics.LLM_CONSENSUS.labels("early").inc()
+                    return response
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        if not votes:
+            metrics.LLM_CONSENSUS.labels("none").inc()
+            return ""
+        winner = max(votes.values(), key=len)
+        metrics.LLM_CONSENSUS.labels("majority" if len(winner) > 1 else "split").inc()
+        return winner[0]
+    
+    async def request_plan(self, question: str, df: pd.DataFrame, deadline: Optional[float] = None,
+                           rows: Optional[int] = None, escalate: bool = False) -> Optional[dict]:
+        """Ask the LLM for a query plan over df (or a sample of `rows` rows)"""
+        request = {
+            "model": config.STRONG_MODEL if escalate else config.GROQ_MODEL,
+            "max_tokens": 512,
+            "system": query_engine.PLAN_SYSTEM_PROMPT,
+            "messages": [
+                {"role": "user", "content": query_engine.plan_request_content(question, df, rows)}
+            ],
+        }
+        response = await self.complete_async(request, deadline)
+        if not response:
+            return None
+        try:
+            return query_engine.parse_plan(response)
+        except query_engine.PlanError as e:
+            print(f"Query plan failed, falling back to LLM analysis: {e}")
+            return None
+    
+    @metrics.timed("query_plan")
+    async def answer_with_plan(self, question: str, df: pd.DataFrame,
+                               deadline: Optional[float] = None, escalate: bool = False) -> Optional[Any]:
+        """Answer a question about df by having the LLM write a query plan
+        and executing it locally. Returns None if no usable plan was produced."""
+        plan = await self.request_plan(question, df, deadline, escalate=escalate)
+        if plan is None:
+            return None
+        try:
+            return query_engine.execute_plan(df, plan)
+        except Exception as e:
+            print(f"Query plan failed, falling back to LLM analysis: {e}")
+            return None
+    
+    @metrics.timed("query_plan")
+    async def answer_csv_with_plan(self, question: str, csv_content: Union[bytes, BinaryIO],
+                                   deadline: Optional[float] = None, escalate: bool = False) -> Optional[Any]:
+        """Like answer_with_plan, but plans from a sample of the CSV and then
+        reads only the columns the plan uses, in chunks for large files"""
+        stream = self._as_stream(csv_content)
+        try:
+            info = await asyncio.to_thread(csv_ingest.sniff, stream)
+        except Exception as e:
+            print(f"Error parsing CSV: {e}")
+            return None
+        if info is None:
+            return None
+        plan = await self.request_plan(question, info["sample"], deadline, rows=info["rows"], escalate=escalate)
+        if plan is None:
+            return None
+        try:
+            return await asyncio.to_thread(csv_ingest.run_plan, stream, info, plan)
+        except Exception as e:
+            print(f"Query plan failed, falling back to LLM analysis: {e}")
+            return None
+    
+    async def probe_content_type_async(self, url: str) -> str:
+        """Content-Type from a HEAD request, or "" if the URL does not answer one"""
+        try:
+            response = await http_client.request("HEAD", url, timeout=config.HTTP_FETCH_TIMEOUT)
+            response.raise_for_status()
+            return response.headers.get("content-type", "")
+        except Exception as e:
+            print(f"Error probing {url}: {e}")
+            return ""
+    
+    @metrics.timed("call_api")
+    async def call_api_async(self, url: str, method: str = "GET", headers: dict = None) -> Optional[dict]:
         """Make API call and return JSON response"""
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=headers, timeout=30)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=headers, timeout=30)
-            else:
+            # Never through the download cache: API responses are dynamic
+            if method.upper() not in ("GET", "POST"):
                 return None
-            
+            response = await http_client.request(method.upper(), url, headers=headers, timeout=30)
             response.raise_for_status()
             return response.json()
         except Exception as e:
             print(f"Error calling API: {e}")
             return None
     
+    def call_api(self, url: str, method: str = "GET", headers: dict = None) -> Optional[dict]:
+        """Make API call and return JSON response (blocking, for CLI use)"""
+        return http_client.run_sync(lambda: self.call_api_async(url, method, headers))
+    
     def parse_answer(self, response: str, instruction: str) -> Any:
         """Parse LLM response to extract answer in correct format"""
         response = response.strip()
@@ -105,13 +563,27 @@ Return ONLY the final answer without explanations."""
         if any(word in instruction.lower() for word in ["true", "false", "yes", "no"]):
             return response.lower() in ["true", "yes", "1"]
         
+        # JSON (or Python literal) objects and lists, before any number in them is picked out
+        if response[:1] in ("{", "[") and response[-1:] in ("}", "]"):
+            try:
+                return json.loads(response)
+            except json.JSONDecodeError:
+                pass
+            try:
+                value = ast.literal_eval(response)
+                if isinstance(value, (dict, list)):
+                    return value
+            except (ValueError, SyntaxError):
+                pass
+        
         # Number detection
         if any(word in instruction.lower() for word in ["sum", "total", "count", "number", "calculate", "value"]):
             numbers = re.findall(r'-?\d+\.?\d*', response)
             if numbers:
                 try:
-                    # Try int first
-                    return int(float(numbers[-1]))
+                    # Whole numbers as int, anything else keeps its fraction
+                    value = float(numbers[-1])
+                    return int(value) if value.is_integer() else value
                 except ValueError:
                     pass
         
@@ -0,0 +1,143 @@
+"""
+Deadline-aware stage budgets, adaptive pacing and request hedging for quiz chains
+"""
+
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+from urllib.parse import urlparse
+
+import config
+
+STAGE_ORDER = ["fetch", "extract", "solve", "parse", "submit"]
+
+
+class StageTimeout(Exception):
+    """Raised when a stage runs past its share of the chain deadline"""
+
+
+class ChainDeadline:
+    """Splits the time left in a quiz chain into per-stage budgets"""
+
+    def __init__(self, total_seconds: float = config.QUIZ_TIMEOUT_SECONDS):
+        self.deadline = time.monotonic() + total_seconds
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def nearly_exhausted(self) -> bool:
+        """True when too little time is left to solve another question"""
+        return self.remaining() <= config.MIN_SOLVE_SECONDS
+
+    def budget(self, stage: str) -> float:
+        """Seconds the stage may use while leaving room for the stages after it"""
+        later = STAGE_ORDER[STAGE_ORDER.index(stage) + 1:]
+        reserve = sum(config.STAGE_RESERVE_SECONDS.get(s, 0) for s in later)
+        return max(0.0, min(config.STAGE_TIMEOUTS[stage], self.remaining() - reserve))
+
+    def stage_deadline(self, stage: str) -> float:
+        """Absolute time.monotonic() deadline for the stage"""
+        return time.monotonic() + self.budget(stage)
+
+    async def run(self, stage: str, coro):
+        """Await coro (or a task) under the stage budget, raising StageTimeout when it runs out"""
+        budget = self.budget(stage)
+        if budget <= 0:
+            if asyncio.iscoroutine(coro):
+                coro.close()
+            else:
+                coro.cancel()
+            raise StageTimeout(f"No time left for {stage}")
+        try:
+            return await asyncio.wait_for(coro, timeout=budget)
+        except asyncio.TimeoutError:
+            raise StageTimeout(f"{stage} exceeded its {budget:.1f}s budget")
+
+
+class AdaptiveRateLimiter:
+    """Per-host pacing that backs off on throttling and relaxes on success"""
+
+    def __init__(self, min_interval: float = config.RATE_LIMIT_MIN_INTERVAL,
+                 max_interval: float = config.RATE_LIMIT_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._interval: Dict[str, float] = {}
+        self._last: Dict[str, float] = {}
+
+    def _host(self, url: str) -> str:
+        return urlparse(url).hostname or ""
+
+    async def wait(self, url: str):
+        """Sleep only as long as the host's current interval requires"""
+        host = self._host(url)
+        interval = self._interval.get(host, self.min_interval)
+        delay = self._last.get(host, 0.0) + interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._last[host] = time.monotonic()
+
+    def record(self, url: str, status_code: int):
+        """Double the interval on 429/5xx, halve it otherwise"""
+        host = self._host(url)
+        interval = self._interval.get(host, self.min_interval)
+        if status_code == 429 or status_code >= 500:
+            interval = min(self.max_interval, max(interval * 2, 0.5))
+        else:
+            interval = interval / 2
+            if interval < 0.05:
+                interval = self.min_interval
+        self._interval[host] = interval
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies per key (e.g. model name)"""
+
+    def __init__(self, window: int = config.LLM_HEDGE_WINDOW,
+                 min_samples: int = config.LLM_HEDGE_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float):
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, or None until min_samples calls have been seen"""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+    def tail_mean(self, key: str, pct: float) -> Optional[float]:
+        """Mean latency of the calls slower than the percentile"""
+        cutoff = self.percentile(key, pct)
+        if cutoff is None:
+            return None
+        tail = [s for s in self._samples[key] if s >= cutoff]
+        return sum(tail) / len(tail)
+
+
+class HedgeBudget:
+    """Caps duplicate requests at a fraction of all requests.
+
+    Every request earns `ratio` tokens (up to `burst`); a hedge spends one.
+    """
+
+    def __init__(self, ratio: float = config.LLM_HEDGE_BUDGET, burst: float = 3.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+
+    def on_request(self):
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
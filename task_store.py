@@ -0,0 +1,291 @@
+"""
+Bounded storage for quiz task status, results and logs
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Optional, Tuple, List
+
+import config
+
+
+class TaskStore(ABC):
+    """Interface shared by the task store backends.
+
+    Log lines keep absolute indices, so a `since` cursor stays valid after
+    older lines have dropped out of a task's ring buffer.
+    """
+
+    @abstractmethod
+    def create(self, task_id: str):
+        """Register a new task as processing"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[dict]:
+        """Return {"status", "result", **extra fields} or None"""
+
+    @abstractmethod
+    def append_log(self, task_id: str, line: str) -> int:
+        """Append a log line and return its absolute index"""
+
+    @abstractmethod
+    def logs_since(self, task_id: str, since: int = 0) -> Tuple[List[str], int]:
+        """Return the retained lines from index `since` on, and the next cursor"""
+
+    @abstractmethod
+    def set_status(self, task_id: str, status: str, result: Optional[dict] = None):
+        """Record a task's status and final result"""
+
+    @abstractmethod
+    def update(self, task_id: str, **fields):
+        """Store extra per-task fields returned by get()"""
+
+    def close(self):
+        """Persist anything pending (called from the app lifespan)"""
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+
+class MemoryTaskStore(TaskStore):
+    """In-process store with TTL and max-entries eviction"""
+
+    def __init__(self, ttl_seconds: float = config.TASK_TTL_SECONDS,
+                 max_entries: int = config.TASK_MAX_ENTRIES,
+                 log_lines: int = config.TASK_LOG_LINES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.log_lines = log_lines
+        self._tasks = OrderedDict()  # least recently updated first
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        while self._tasks:
+            task_id, task = next(iter(self._tasks.items()))
+            if task["updated_at"] > cutoff and len(self._tasks) <= self.max_entries:
+                break
+            del self._tasks[task_id]
+
+    def _touch(self, task_id: str) -> Optional[dict]:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return None
+        task["updated_at"] = time.time()
+        self._tasks.move_to_end(task_id)
+        return task
+
+    def create(self, task_id: str):
+        with self._lock:
+            self._tasks[task_id] = {
+                "status": "processing",
+                "result": None,
+                "logs": deque(maxlen=self.log_lines),
+                "log_total": 0,
+                "extra": {},
+                "updated_at": time.time(),
+            }
+            self._evict()
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            self._evict()
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            return {"status": task["status"], "result": task["result"], **task["extra"]}
+
+    def append_log(self, task_id: str, line: str) -> int:
+        with self._lock:
+            task = self._touch(task_id)
+            if task is None:
+                return -1
+            task["logs"].append(line)
+            task["log_total"] += 1
+            return task["log_total"] - 1
+
+    def logs_since(self, task_id: str, since: int = 0) -> Tuple[List[str], int]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return [], since
+            logs = task["logs"]
+            first = task["log_total"] - len(logs)
+            start = max(since, first) - first
+            return [logs[i] for i in range(start, len(logs))], task["log_total"]
+
+    def set_status(self, task_id: str, status: str, result: Optional[dict] = None):
+        with self._lock:
+            task = self._touch(task_id)
+            if task is None:
+                return
+            task["status"] = status
+            task["result"] = result
+
+    def update(self, task_id: str, **fields):
+        with self._lock:
+            task = self._touch(task_id)
+            if task is not None:
+                task["extra"].update(fields)
+
+
+class SQLiteTaskStore(TaskStore):
+    """SQLite-backed store that survives restarts.
+
+    Writes are committed in batches by a background thread every
+    `commit_interval` seconds, so the event loop never waits on a disk sync
+    per log line. Tasks still "processing" when the store is opened were
+    cut off by a restart and are marked failed.
+    """
+
+    def __init__(self, db_path: str = config.TASK_STORE_DB,
+                 ttl_seconds: float = config.TASK_TTL_SECONDS,
+                 max_entries: int = config.TASK_MAX_ENTRIES,
+                 log_lines: int = config.TASK_LOG_LINES,
+                 commit_interval: float = config.TASK_STORE_COMMIT_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.log_lines = log_lines
+        self.commit_interval = commit_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._closed = threading.Event()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "task_id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, "
+            "extra TEXT NOT NULL DEFAULT '{}', log_total INTEGER NOT NULL DEFAULT 0, "
+            "updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS tasks_updated ON tasks (updated_at);"
+            "CREATE TABLE IF NOT EXISTS task_logs ("
+            "task_id TEXT NOT NULL, idx INTEGER NOT NULL, line TEXT NOT NULL, "
+            "PRIMARY KEY (task_id, idx));"
+        )
+        self._db.execute(
+            "UPDATE tasks SET status = 'failed', result = ?, updated_at = ? WHERE status = 'processing'",
+            (json.dumps({"error": "Server restarted while the task was running"}), time.time()),
+        )
+        self._db.commit()
+        self._flusher = threading.Thread(target=self._flush_loop, name="task-store-commit", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.commit_interval):
+            self.flush()
+
+    def flush(self):
+        """Commit pending writes"""
+        with self._lock:
+            if self._dirty:
+                self._db.commit()
+                self._dirty = False
+
+    def close(self):
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM tasks WHERE updated_at <= ?", (cutoff,))
+        self._db.execute(
+            "DELETE FROM tasks WHERE task_id IN ("
+            "SELECT task_id FROM tasks ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self._db.execute(
+            "DELETE FROM task_logs WHERE task_id NOT IN (SELECT task_id FROM tasks)"
+        )
+
+    def create(self, task_id: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tasks (task_id, status, updated_at) VALUES (?, ?, ?)",
+                (task_id, "processing", time.time()),
+            )
+            self._db.execute("DELETE FROM task_logs WHERE task_id = ?", (task_id,))
+            self._evict()
+            self._dirty = True
+
+    def get(self, task_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, result, extra, updated_at FROM tasks WHERE task_id = ?",
+                (task_id,),
+            ).fetchone()
+        if row is None or row[3] <= time.time() - self.ttl_seconds:
+            return None
+        result = json.loads(row[1]) if row[1] is not None else None
+        return {"status": row[0], "result": result, **json.loads(row[2])}
+
+    def append_log(self, task_id: str, line: str) -> int:
+        with self._lock:
+            self._db.execute(
+                "UPDATE tasks SET log_total = log_total + 1, updated_at = ? WHERE task_id = ?",
+                (time.time(), task_id),
+            )
+            row = self._db.execute(
+                "SELECT log_total FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return -1
+            index = row[0] - 1
+            self._db.execute(
+                "INSERT INTO task_logs (task_id, idx, line) VALUES (?, ?, ?)",
+                (task_id, index, line),
+            )
+            self._db.execute(
+                "DELETE FROM task_logs WHERE task_id = ? AND idx <= ?",
+                (task_id, index - self.log_lines),
+            )
+            self._dirty = True
+            return index
+
+    def logs_since(self, task_id: str, since: int = 0) -> Tuple[List[str], int]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT log_total FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return [], since
+            lines = self._db.execute(
+                "SELECT line FROM task_logs WHERE task_id = ? AND idx >= ? ORDER BY idx",
+                (task_id, since),
+            ).fetchall()
+        return [line for (line,) in lines], row[0]
+
+    def set_status(self, task_id: str, status: str, result: Optional[dict] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE tasks SET status = ?, result = ?, updated_at = ? WHERE task_id = ?",
+                (status, json.dumps(result), time.time(), task_id),
+            )
+            self._dirty = True
+
+    def update(self, task_id: str, **fields):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT extra FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return
+            extra = json.loads(row[0])
+            extra.update(fields)
+            self._db.execute(
+                "UPDATE tasks SET extra = ?, updated_at = ? WHERE task_id = ?",
+                (json.dumps(extra, default=str), time.time(), task_id),
+            )
+            self._dirty = True
+
+
+def create_task_store() -> TaskStore:
+    """Build the backend selected by TASK_STORE_BACKEND"""
+    if config.TASK_STORE_BACKEND == "sqlite":
+        return SQLiteTaskStore()
+    return MemoryTaskStore()
@@ -22,6 +22,14 @@ def test_health():
     print(f"Status: {response.status_code}")
     print(f"Response: {response.json()}\n")
 
+def test_metrics():
+    """Test Prometheus metrics endpoint"""
+    print("Testing /metrics endpoint...")
+    response = requests.get(f"{BASE_URL}/metrics")
+    print(f"Status: {response.status_code}")
+    stages = [line for line in response.text.splitlines() if line.startswith("quiz_stage_seconds_count")]
+    print(f"Stage counters: {stages}\n")
+
 def test_invalid_json():
     """Test with invalid JSON"""
     print("Testing with invalid JSON...")
@@ -69,6 +77,7 @@ if __name__ == "__main__":
     print(f"Email: {STUDENT_EMAIL}\n")
     
     test_health()
+    test_metrics()
     test_invalid_json()
     test_missing_fields()
     test_invalid_credentials()
@@ -0,0 +1,13 @@
+"""
+Shared pytest setup: modules live at the repository root
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main and quiz_solver refuse to import without credentials
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+os.environ.setdefault("STUDENT_EMAIL", "student@example.com")
+os.environ.setdefault("STUDENT_SECRET", "secret")
@@ -0,0 +1,126 @@
+"""
+Tests for the browser pool's context accounting, against a fake Playwright
+"""
+
+import asyncio
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        browser.open_contexts += 1
+
+    async def close(self):
+        self.browser.open_contexts -= 1
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.open_contexts = 0
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, **options):
+        return FakeContext(self)
+
+    async def close(self):
+        pass
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = self
+        self.browser = FakeBrowser()
+
+    async def start(self):
+        return self
+
+    async def launch(self, headless=True):
+        return self.browser
+
+    async def stop(self):
+        pass
+
+
+@pytest.fixture
+def playwright(monkeypatch):
+    fake = FakePlaywright()
+    monkeypatch.setattr(browser_pool, "async_playwright", lambda: fake)
+    return fake
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_spare_counts_against_max_contexts(playwright):
+    async def scenario():
+        pool = BrowserPool(max_contexts=2, recycle_after=100)
+        await pool.warm()
+        async with pool.context(locale="en-US"):
+            assert pool.stats()["spare_context"]
+            async with pool.context(locale="de-DE"):
+                # The second slot was the spare's: it is closed to make room
+                assert not pool.stats()["spare_context"]
+                assert playwright.browser.open_contexts == 2
+            await pool.warm()
+            await pool.warm()  # one spare at most
+            assert playwright.browser.open_contexts == 2
+        await pool.stop()
+
+    run(scenario())
+
+
+def test_spare_is_handed_over_with_its_slot(playwright):
+    async def scenario():
+        pool = BrowserPool(max_contexts=1, recycle_after=100)
+        await pool.warm()
+        async with pool.context() as context:
+            assert not pool.stats()["spare_context"]
+            assert playwright.browser.open_contexts == 1
+        async with pool.context() as again:
+            assert again is not context
+        assert playwright.browser.open_contexts == 0
+        await pool.stop()
+
+    run(scenario())
+
+
+def test_idle_spare_gives_up_its_slot_when_the_pool_is_full(playwright):
+    async def scenario():
+        pool = BrowserPool(max_contexts=1, recycle_after=100)
+        await pool.warm()
+        # Options rule out the spare; it is closed so this call does not wait forever
+        async with pool.context(locale="en-US"):
+            assert not pool.stats()["spare_context"]
+            assert playwright.browser.open_contexts == 1
+        assert playwright.browser.open_contexts == 0
+        await pool.stop()
+
+    run(scenario())
+
+
+def test_live_contexts_never_exceed_max(playwright):
+    async def scenario():
+        pool = BrowserPool(max_contexts=2, recycle_after=100)
+        peak = 0
+
+        async def render(options):
+            nonlocal peak
+            async with pool.context(**options):
+                peak = max(peak, playwright.browser.open_contexts)
+                await pool.warm()
+                peak = max(peak, playwright.browser.open_contexts)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(render({} if i % 2 else {"locale": "en-US"}) for i in range(8)))
+        await pool.stop()
+        return peak
+
+    assert run(scenario()) == 2
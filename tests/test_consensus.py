@@ -0,0 +1,74 @@
+"""
+Tests for answer voting in QuizSolver.analyze_data_consensus
+"""
+
+import asyncio
+
+import pytest
+
+import config
+from quiz_solver import QuizSolver
+
+INSTRUCTION = "What is the total of the value column?"
+
+
+@pytest.fixture
+def vote(monkeypatch):
+    """Run a vote where candidate i replies replies[i] = (delay, text);
+    returns (winning response, candidates that ran to completion)"""
+    monkeypatch.setattr(config, "CONSENSUS_MODELS", [])
+    monkeypatch.setattr(config, "CONSENSUS_TEMPERATURES", [0.0, 0.1, 0.2, 0.3])
+    solver = QuizSolver("test-key")
+    monkeypatch.setattr(solver, "_analysis_request",
+                        lambda query, data, escalate: {"model": "m", "messages": []})
+
+    def run(*replies, quorum=2):
+        finished = []
+
+        async def complete_async(request, deadline=None):
+            candidate = config.CONSENSUS_TEMPERATURES.index(request["temperature"])
+            delay, text = replies[candidate]
+            await asyncio.sleep(delay)
+            finished.append(candidate)
+            return text
+
+        monkeypatch.setattr(solver, "complete_async", complete_async)
+
+        async def scenario():
+            response = await solver.analyze_data_consensus(
+                "total?", "value\n1\n", INSTRUCTION, candidates=len(replies), quorum=quorum
+            )
+            await asyncio.sleep(0.2)  # cancelled candidates would finish by now
+            return response
+
+        return asyncio.run(scenario()), finished
+
+    return run
+
+
+def test_quorum_returns_early_and_cancels_the_rest(vote):
+    response, finished = vote((0.01, "42"), (0.02, "The total is 41"), (0.03, "Answer: 42"), (0.1, "41"))
+    assert response == "Answer: 42"
+    assert finished == [0, 1, 2]
+
+
+def test_majority_wins_without_a_quorum(vote):
+    response, finished = vote((0.01, "7"), (0.02, "The total is 8"), (0.03, "8"), quorum=3)
+    assert response == "The total is 8"
+    assert finished == [0, 1, 2]
+
+
+def test_tie_goes_to_the_earliest_answer(vote):
+    response, _ = vote((0.02, "7"), (0.01, "8"), quorum=3)
+    assert response == "8"
+
+
+def test_empty_replies_do_not_vote(vote):
+    response, _ = vote((0.01, ""), (0.02, "5"), (0.03, ""))
+    assert response == "5"
+
+
+def test_all_empty_returns_empty(vote):
+    response, finished = vote((0.01, ""), (0.02, ""), (0.03, ""))
+    assert response == ""
+    assert finished == [0, 1, 2]
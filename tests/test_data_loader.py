@@ -0,0 +1,137 @@
+"""
+Tests for attachment format detection and archive unwrapping
+"""
+
+import io
+import gzip
+import json
+import zipfile
+
+import pandas as pd
+import pytest
+
+import config
+import data_loader
+from data_loader import detect_format, open_datasets
+
+CSV = b"name,score\nann,3\nbob,5\ncat,8\n"
+RECORDS = [{"name": "ann", "score": 3}, {"name": "bob", "score": 5}]
+
+
+def xlsx_bytes() -> bytes:
+    pytest.importorskip("openpyxl")
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        pd.DataFrame({"a": [1]}).to_excel(writer, sheet_name="small", index=False)
+        pd.DataFrame({"name": ["ann", "bob", "cat"], "score": [3, 5, 8]}).to_excel(
+            writer, sheet_name="data", index=False)
+    return buffer.getvalue()
+
+
+def zip_bytes(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("content, name, content_type, expected", [
+    (CSV, "scores.csv", "", "csv"),
+    (CSV, "download", "", "csv"),
+    (CSV, "data", "text/csv; charset=utf-8", "csv"),
+    (json.dumps(RECORDS).encode(), "", "", "json"),
+    (b'{"a": 1}\n{"a": 2}\n', "", "", "ndjson"),
+    (b'{"a": 1}\n{"a": 2}\n', "", "application/x-ndjson", "ndjson"),
+    (b"<html><table><tr><td>1</td></tr></table></html>", "", "", "html"),
+    (b"%PDF-1.4 ...", "report", "application/octet-stream", "pdf"),
+    (gzip.compress(CSV), "scores", "", "gzip"),
+    (zip_bytes({"a.csv": CSV}), "", "", "zip"),
+    (b"just a sentence of prose", "notes", "", None),
+])
+def test_detect_format(content, name, content_type, expected):
+    stream = io.BytesIO(content)
+    assert detect_format(stream, name, content_type) == expected
+    assert stream.tell() == 0
+
+
+def test_detect_xlsx_despite_zip_magic():
+    assert detect_format(io.BytesIO(xlsx_bytes()), "download") == "xlsx"
+
+
+def test_is_data_link():
+    assert data_loader.is_data_link("https://example.com/files/scores.CSV")
+    assert not data_loader.is_data_link("https://example.com/api/export")
+    assert not data_loader.is_data_link("https://example.com/about.php")
+    assert data_loader.may_be_data_link("/api/export")
+    assert not data_loader.may_be_data_link("/about.php")
+    assert not data_loader.may_be_data_link("/")
+
+
+@pytest.mark.parametrize("content_type, expected", [
+    ("text/csv; charset=utf-8", True),
+    ("application/json", True),
+    ("application/octet-stream", True),
+    ("text/html; charset=utf-8", False),
+    ("text/plain", False),
+    ("", False),
+])
+def test_is_data_content_type(content_type, expected):
+    assert data_loader.is_data_content_type(content_type) == expected
+
+
+def test_plain_file_is_one_dataset():
+    datasets = open_datasets(io.BytesIO(CSV), "scores.csv")
+    assert [(d.name, d.format) for d in datasets] == [("scores.csv", "csv")]
+    assert datasets[0].frame["score"].sum() == 16
+
+
+def test_gzip_is_unwrapped():
+    datasets = open_datasets(io.BytesIO(gzip.compress(CSV)), "scores.csv.gz")
+    assert [(d.name, d.format) for d in datasets] == [("scores.csv", "csv")]
+    assert datasets[0].frame["name"].tolist() == ["ann", "bob", "cat"]
+
+
+def test_zip_members_skip_metadata_and_nest():
+    inner = zip_bytes({"deep.json": json.dumps(RECORDS)})
+    archive = zip_bytes({
+        "a.csv": CSV,
+        "__MACOSX/._a.csv": b"junk",
+        ".DS_Store": b"junk",
+        "nested.zip": inner,
+        "b.csv.gz": gzip.compress(CSV),
+    })
+    datasets = open_datasets(io.BytesIO(archive), "bundle.zip")
+    assert sorted((d.name, d.format) for d in datasets) == [
+        ("a.csv", "csv"), ("b.csv", "csv"), ("deep.json", "json"),
+    ]
+    deep = next(d for d in datasets if d.name == "deep.json")
+    assert deep.frame["score"].tolist() == [3, 5]
+    for dataset in datasets:
+        dataset.close()
+
+
+def test_xlsx_takes_the_largest_sheet():
+    datasets = open_datasets(io.BytesIO(xlsx_bytes()), "book.xlsx")
+    assert [d.format for d in datasets] == ["xlsx"]
+    assert datasets[0].frame["score"].tolist() == [3, 5, 8]
+
+
+def test_archive_depth_is_bounded():
+    content = CSV
+    for _ in range(data_loader.MAX_ARCHIVE_DEPTH + 1):
+        content = gzip.compress(content)
+    datasets = open_datasets(io.BytesIO(content), "deep")
+    assert [d.format for d in datasets] == ["gzip"]
+
+
+def test_oversized_member_is_rejected(monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_MAX_BYTES", 10)
+    with pytest.raises(ValueError):
+        open_datasets(io.BytesIO(zip_bytes({"a.csv": CSV})), "a.zip")
+
+
+def test_unparseable_data_loads_as_none():
+    dataset = open_datasets(io.BytesIO(b"[1, 2"), "broken.json")[0]
+    assert dataset.format == "json"
+    assert dataset.value is None
@@ -0,0 +1,88 @@
+"""
+Tests for the download cache and its use in QuizSolver.download_to_file_async
+"""
+
+import os
+import asyncio
+
+import httpx
+import pytest
+
+import http_client
+from download_cache import DownloadCache, freshness_lifetime
+from quiz_solver import QuizSolver
+
+URL = "https://example.com/data.csv"
+
+
+def test_freshness_lifetime():
+    assert freshness_lifetime({"cache-control": "max-age=60"}) == 60.0
+    assert freshness_lifetime({"cache-control": "max-age=60, no-cache", "etag": '"v1"'}) == 0.0
+    assert freshness_lifetime({"cache-control": "no-store", "etag": '"v1"'}) is None
+    assert freshness_lifetime({}) is None
+
+
+@pytest.fixture
+def fetch(monkeypatch, tmp_path):
+    """Download URL through a solver with a fresh cache; returns (body, requests seen)"""
+    solver = QuizSolver("test-key")
+    solver.download_cache = DownloadCache(str(tmp_path / "downloads"))
+    requests = []
+    responses = []
+
+    def handler(request):
+        requests.append(request)
+        return responses.pop(0)
+
+    def run(*queued):
+        responses.extend(queued)
+
+        async def scenario():
+            monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            try:
+                body = await solver.download_to_file_async(URL)
+                return body.read() if body is not None else None
+            finally:
+                await http_client.stop()
+
+        return asyncio.run(scenario())
+
+    run.solver = solver
+    run.requests = requests
+    return run
+
+
+def test_fresh_copy_is_served_without_a_request(fetch):
+    assert fetch(httpx.Response(200, content=b"a,b\n1,2\n", headers={"cache-control": "max-age=60"})) == b"a,b\n1,2\n"
+    assert fetch() == b"a,b\n1,2\n"
+    assert len(fetch.requests) == 1
+
+
+def test_blob_evicted_after_lookup_is_a_miss(fetch, monkeypatch):
+    fetch(httpx.Response(200, content=b"old", headers={"cache-control": "max-age=60"}))
+    cache = fetch.solver.download_cache
+    lookup = cache.lookup
+
+    def evicting_lookup(key):
+        entry = lookup(key)
+        os.remove(cache._blob_path(entry["content_hash"]))
+        return entry
+
+    monkeypatch.setattr(cache, "lookup", evicting_lookup)
+    assert fetch(httpx.Response(200, content=b"new")) == b"new"
+    assert "if-none-match" not in fetch.requests[-1].headers
+
+
+def test_blob_evicted_after_304_is_fetched_again(fetch, monkeypatch):
+    fetch(httpx.Response(200, content=b"old", headers={"etag": '"v1"'}))
+    cache = fetch.solver.download_cache
+    refresh = cache.refresh
+
+    def evicting_refresh(key, headers):
+        refresh(key, headers)
+        os.remove(cache._blob_path(cache.lookup(key)["content_hash"]))
+
+    monkeypatch.setattr(cache, "refresh", evicting_refresh)
+    assert fetch(httpx.Response(304), httpx.Response(200, content=b"new")) == b"new"
+    assert fetch.requests[1].headers["if-none-match"] == '"v1"'
+    assert "if-none-match" not in fetch.requests[2].headers
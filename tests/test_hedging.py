@@ -0,0 +1,118 @@
+"""
+Tests for hedged LLM requests (QuizSolver._hedged_send) against a fake client
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import config
+from llm_limiter import LLMRateLimiter
+from quiz_solver import QuizSolver
+from scheduler import HedgeBudget, LatencyTracker
+
+REQUEST = {"model": "m", "max_tokens": 10, "messages": [{"role": "user", "content": "q"}]}
+
+
+class FakeMessages:
+    """Answers call n after delays[n] seconds, recording what was sent and cancelled"""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.models = []
+        self.finished = []
+        self.cancelled = []
+
+    async def create(self, **request):
+        call = len(self.models)
+        self.models.append(request["model"])
+        try:
+            await asyncio.sleep(self.delays[call])
+        except asyncio.CancelledError:
+            self.cancelled.append(call)
+            raise
+        self.finished.append(call)
+        return SimpleNamespace(content=[SimpleNamespace(text=f"reply {call}")])
+
+
+@pytest.fixture
+def send(monkeypatch):
+    """Run one hedged send; the observed p90 latency of model "m" is 50ms"""
+    monkeypatch.setattr(config, "LLM_HEDGE", True)
+    monkeypatch.setattr(config, "LLM_HEDGE_MODEL", "")
+    solver = QuizSolver("test-key")
+    solver.rate_limiter = LLMRateLimiter(limits={}, default={"rpm": None, "tpm": None}, max_in_flight=10)
+    solver.hedge_budget = HedgeBudget(ratio=1.0)
+    solver.latencies = LatencyTracker(window=20, min_samples=5)
+    for _ in range(5):
+        solver.latencies.record("m", 0.05)
+
+    def run(*delays, timeout=5.0):
+        messages = run.messages = FakeMessages(delays)
+        solver.async_client = SimpleNamespace(messages=messages)
+
+        async def scenario():
+            try:
+                return await solver._hedged_send(REQUEST, timeout)
+            finally:
+                await asyncio.sleep(0.05)  # let cancellations land
+
+        return asyncio.run(scenario()), messages
+
+    run.solver = solver
+    return run
+
+
+def test_fast_primary_sends_no_hedge(send):
+    reply, messages = send(0.01)
+    assert reply.content[0].text == "reply 0"
+    assert messages.models == ["m"]
+
+
+def test_hedge_wins_and_the_primary_is_cancelled(send):
+    reply, messages = send(1.0, 0.01)
+    assert reply.content[0].text == "reply 1"
+    assert messages.finished == [1]
+    assert messages.cancelled == [0]
+
+
+def test_primary_wins_and_the_hedge_is_cancelled(send):
+    reply, messages = send(0.1, 1.0)
+    assert reply.content[0].text == "reply 0"
+    assert messages.finished == [0]
+    assert messages.cancelled == [1]
+
+
+def test_hedge_goes_to_the_hedge_model(send, monkeypatch):
+    monkeypatch.setattr(config, "LLM_HEDGE_MODEL", "fast")
+    reply, messages = send(1.0, 0.01)
+    assert messages.models == ["m", "fast"]
+
+
+def test_exhausted_budget_sends_no_hedge(send):
+    send.solver.hedge_budget = HedgeBudget(ratio=0.0)
+    reply, messages = send(0.1, 0.01)
+    assert reply.content[0].text == "reply 0"
+    assert messages.models == ["m"]
+
+
+def test_budget_caps_the_share_of_hedges(send, monkeypatch):
+    send.solver.hedge_budget = HedgeBudget(ratio=0.5)
+    monkeypatch.setattr(send.solver.latencies, "record", lambda model, seconds: None)  # keep p90 at 50ms
+    hedged = [len(send(0.08, 0.01)[1].models) == 2 for _ in range(4)]
+    assert hedged == [False, True, False, True]
+
+
+def test_no_hedge_without_rate_limit_capacity(send, monkeypatch):
+    monkeypatch.setattr(send.solver.rate_limiter, "has_capacity", lambda model, tokens: False)
+    reply, messages = send(0.1, 0.01)
+    assert reply.content[0].text == "reply 0"
+    assert messages.models == ["m"]
+
+
+def test_timeout_cancels_every_call(send):
+    with pytest.raises(asyncio.TimeoutError):
+        send(1.0, 1.0, timeout=0.2)
+    assert send.messages.models == ["m", "m"]
+    assert sorted(send.messages.cancelled) == [0, 1]
@@ -0,0 +1,38 @@
+"""
+Tests for the LLM response cache
+"""
+
+import asyncio
+
+from llm_cache import LLMCache, make_key
+
+
+def test_make_key_ignores_dict_order():
+    assert make_key({"model": "m", "max_tokens": 10}) == make_key({"max_tokens": 10, "model": "m"})
+    assert make_key({"model": "m"}) != make_key({"model": "n"})
+
+
+def test_sqlite_tier_outlives_the_memory_tier(tmp_path):
+    path = str(tmp_path / "llm.db")
+    LLMCache(db_path=path).set("k", "42")
+    cache = LLMCache(db_path=path)
+    assert asyncio.run(cache.get_async("k")) == "42"
+    assert asyncio.run(cache.get_async("missing")) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = LLMCache(ttl_seconds=-1, db_path=str(tmp_path / "llm.db"))
+    cache.set("k", "42")
+    assert cache.get("k") is None
+
+
+def test_invalidate_drops_both_tiers(tmp_path):
+    path = str(tmp_path / "llm.db")
+    cache = LLMCache(db_path=path)
+    asyncio.run(cache.set_async("a", "1"))
+    cache.set("b", "2")
+    asyncio.run(cache.invalidate_async(["a"]))
+    assert cache.get("a") is None
+    assert LLMCache(db_path=path).get("a") is None
+    assert cache.get("b") == "2"
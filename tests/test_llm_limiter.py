@@ -0,0 +1,183 @@
+"""
+Tests for LLM admission control
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm_limiter
+from llm_limiter import LLMRateLimiter, TokenBucket
+
+UNLIMITED = {"rpm": None, "tpm": None}
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+
+async def hold(limiter, model, deadline=None):
+    async with limiter.slot(model, 10, deadline):
+        pass
+
+
+def test_token_bucket_refills_and_caps():
+    bucket = TokenBucket(60)  # one unit per second
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0
+    bucket.consume(61)
+    assert bucket.wait_time(1, now) == pytest.approx(2.0)
+    assert bucket.wait_time(1000, now) == pytest.approx(61.0)  # only waits for a full bucket
+    assert bucket.wait_time(1, now + 2) == pytest.approx(0.0)
+
+
+def test_grants_follow_deadline_order():
+    async def scenario():
+        limiter = LLMRateLimiter(limits={}, default=UNLIMITED, max_in_flight=1)
+        order = []
+
+        async def call(deadline):
+            async with limiter.slot("m", 10, deadline):
+                order.append(deadline)
+                await asyncio.sleep(0.01)
+
+        async with limiter.slot("m", 10, 0):
+            tasks = [asyncio.create_task(call(d)) for d in (30, None, 10, 20)]
+            await asyncio.sleep(0.01)  # all queued behind the held slot
+        await asyncio.gather(*tasks)
+        return order
+
+    assert run(scenario()) == [10, 20, 30, None]
+
+
+def test_in_flight_cap():
+    async def scenario():
+        limiter = LLMRateLimiter(limits={}, default=UNLIMITED, max_in_flight=2)
+        active = peak = 0
+
+        async def call():
+            nonlocal active, peak
+            async with limiter.slot("m", 10):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.02)
+                active -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak, limiter._in_flight
+
+    assert run(scenario()) == (2, 0)
+
+
+def test_requests_per_minute():
+    async def scenario():
+        # Two requests fit the bucket; the third waits for a refill (50ms)
+        limiter = LLMRateLimiter(limits={"m": {"rpm": 2}}, max_in_flight=10)
+        limiter._model("m").requests.rate = 20.0
+        start = time.monotonic()
+        stamps = []
+        for _ in range(3):
+            async with limiter.slot("m", 10):
+                stamps.append(time.monotonic() - start)
+        return stamps
+
+    stamps = run(scenario())
+    assert stamps[1] < 0.03
+    assert stamps[2] >= 0.04
+
+
+def test_a_throttled_model_does_not_block_others():
+    async def scenario():
+        limiter = LLMRateLimiter(limits={"slow": {"rpm": 60}, "fast": UNLIMITED}, max_in_flight=10)
+        limiter.on_rate_limited("slow", retry_after=5)
+        slow = asyncio.create_task(hold(limiter, "slow", deadline=0))
+        await asyncio.sleep(0.01)
+        async with limiter.slot("fast", 10, deadline=100):
+            pass
+        slow_granted = slow.done()  # "fast" got through while "slow" still waits
+        slow.cancel()
+        return slow_granted
+
+    assert run(scenario()) is False
+
+
+def test_rate_limit_backoff():
+    async def scenario():
+        limiter = LLMRateLimiter(limits={}, default={"rpm": 600}, max_in_flight=10)
+        limiter.on_rate_limited("m")
+        first = limiter._model("m").blocked_until - time.monotonic()
+        limiter.on_rate_limited("m")
+        second = limiter._model("m").blocked_until - time.monotonic()
+        blocked = not limiter.has_capacity("m", 10)
+        limiter.on_success("m")
+        return first, second, blocked, limiter._model("m").backoff
+
+    first, second, blocked, backoff = run(scenario())
+    assert first == pytest.approx(1.0, abs=0.05)
+    assert second == pytest.approx(2.0, abs=0.05)
+    assert blocked
+    assert backoff == 0.0
+
+
+def test_retry_after_delays_the_next_call():
+    async def scenario():
+        limiter = LLMRateLimiter(limits={}, default=UNLIMITED, max_in_flight=10)
+        limiter.on_rate_limited("m", retry_after=0.1)
+        start = time.monotonic()
+        async with limiter.slot("m", 10):
+            return time.monotonic() - start
+
+    assert run(scenario()) >= 0.09
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        limiter = LLMRateLimiter(limits={}, default=UNLIMITED, max_in_flight=1)
+        async with limiter.slot("m", 10):
+            waiter = asyncio.create_task(hold(limiter, "m", deadline=0))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        async with limiter.slot("m", 10):
+            return limiter._in_flight
+
+    assert run(scenario()) == 1
+
+
+def test_request_over_the_token_limit_is_rejected_up_front():
+    async def scenario():
+        limiter = LLMRateLimiter(limits={"m": {"rpm": 30, "tpm": 5000}}, max_in_flight=10)
+        with pytest.raises(llm_limiter.RequestTooLarge):
+            async with limiter.slot("m", 24000):
+                pass
+        # Nothing was queued or consumed, so a normal call goes straight through
+        async with limiter.slot("m", 4000):
+            return limiter._model("m").tokens.tokens
+
+    assert run(scenario()) == pytest.approx(1000, abs=1)
+
+
+def test_record_usage_corrects_the_estimate():
+    limiter = LLMRateLimiter(limits={}, default={"tpm": 1000}, max_in_flight=10)
+    limits = limiter._model("m")
+    limits.consume(100)
+    limiter.record_usage("m", estimated=100, actual=400)
+    assert limits.tokens.tokens == pytest.approx(600, abs=1)
+    limiter.record_usage("m", estimated=100, actual=None)
+    assert limits.tokens.tokens == pytest.approx(600, abs=1)
+
+
+def test_error_helpers():
+    response = SimpleNamespace(status_code=429, headers={"retry-after": "2.5"})
+    error = SimpleNamespace(response=response)
+    assert llm_limiter.is_rate_limited(error)
+    assert llm_limiter.retry_after(error) == 2.5
+    dated = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+    assert llm_limiter.retry_after(dated) is None
+    assert not llm_limiter.is_rate_limited(ValueError("boom"))
+
+    message = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+    assert llm_limiter.usage_tokens(message) == 150
+    assert llm_limiter.usage_tokens(SimpleNamespace()) is None
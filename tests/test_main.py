@@ -0,0 +1,107 @@
+"""
+Tests for the quiz chain helpers in main
+"""
+
+import asyncio
+
+import pytest
+
+import config
+import main
+from llm_cache import LLMCache, make_key
+
+
+@pytest.mark.parametrize("host, site", [
+    ("quiz.example.com", "example.com"),
+    ("a.b.example.co.uk", "example.co.uk"),
+    ("cdn.other.co.uk", "other.co.uk"),
+    ("127.0.0.1", "127.0.0.1"),
+    ("localhost", "localhost"),
+])
+def test_site(host, site):
+    assert main._site(host) == site
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """Run process_quiz_chain against one fake page; returns the submitted answers"""
+    submitted = []
+    verdict = {"correct": True}
+
+    async def fetch_quiz_page(url):
+        return "<html></html>", "http"
+
+    async def submit_answer(submit_url, email, secret, quiz_url, answer):
+        submitted.append(answer)
+        return dict(verdict)
+
+    monkeypatch.setattr(main, "fetch_quiz_page", fetch_quiz_page)
+    monkeypatch.setattr(main, "submit_answer", submit_answer)
+    monkeypatch.setattr(main, "extract_quiz_instruction",
+                        lambda html: {"instruction": "What is the total of the value column?", "links": []})
+    monkeypatch.setattr(main, "extract_submit_url", lambda html: "https://example.com/submit")
+    monkeypatch.setattr(config, "PIPELINE_WARM", False)
+    monkeypatch.setattr(config, "PIPELINE_PREFETCH", False)
+
+    def run(solve, correct=True):
+        verdict["correct"] = correct
+        monkeypatch.setattr(main, "solve_quiz", solve)
+        main.quiz_results.create("test-task")
+        asyncio.run(main.process_quiz_chain("test-task", "a@example.com", "s", "https://example.com/q1"))
+        return main.quiz_results.get("test-task")["status"], submitted
+
+    return run
+
+
+def test_solution_is_submitted(chain):
+    async def solve(quiz_data, deadline=None, escalate=False):
+        return "The total is 42"
+
+    assert chain(solve) == ("completed", [42])
+
+
+def test_empty_solution_is_never_submitted(chain):
+    calls = []
+
+    async def solve(quiz_data, deadline=None, escalate=False):
+        calls.append(1)
+        return ""
+
+    assert chain(solve) == ("failed", [])
+    assert len(calls) == 2  # retried once
+
+
+def test_solve_timeout_submits_a_best_effort_answer(chain, monkeypatch):
+    monkeypatch.setitem(config.STAGE_TIMEOUTS, "solve", 0.05)
+
+    async def solve(quiz_data, deadline=None, escalate=False):
+        await asyncio.sleep(1)
+        return "42"
+
+    assert chain(solve) == ("completed", [0])
+
+
+def test_nearly_exhausted_chain_submits_without_solving(chain, monkeypatch):
+    monkeypatch.setattr(config, "QUIZ_TIMEOUT_SECONDS", 30)
+    monkeypatch.setattr(config, "MIN_SOLVE_SECONDS", 60)
+
+    async def solve(quiz_data, deadline=None, escalate=False):
+        raise AssertionError("no time to solve")
+
+    assert chain(solve) == ("completed", [0])
+
+
+def test_rejected_answer_is_dropped_from_the_llm_cache(chain, monkeypatch, tmp_path):
+    monkeypatch.setattr(main.solver, "cache", LLMCache(db_path=str(tmp_path / "llm.db")))
+    monkeypatch.setattr(config, "ROUTER_ESCALATE", False)
+    request = {"model": "m", "messages": [{"role": "user", "content": "total?"}]}
+    kept = {"model": "m", "messages": [{"role": "user", "content": "other"}]}
+    main.solver.cache.set(make_key(request), "The total is 41")
+    main.solver.cache.set(make_key(kept), "7")
+
+    async def solve(quiz_data, deadline=None, escalate=False):
+        return await main.solver.complete_async(request, deadline)
+
+    assert chain(solve, correct=False) == ("failed", [41])
+    assert main.solver.cache.get(make_key(request)) is None
+    assert main.solver.cache.get(make_key(kept)) == "7"
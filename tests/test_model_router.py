@@ -0,0 +1,53 @@
+"""
+Tests for per-question model routing and the prompts built for each route
+"""
+
+import pytest
+
+import config
+import model_router
+import prompt_builder
+from quiz_solver import QuizSolver
+
+
+@pytest.mark.parametrize("instruction, expected", [
+    ("What is the secret code on the page?", "extraction"),
+    ("What is the sum of the value column?", "arithmetic"),
+    ("Find the minimum price", "arithmetic"),
+    ("How long, in minutes, did the download take to start?", "extraction"),
+    ("Explain the trend in monthly sales", "reasoning"),
+])
+def test_classify_by_instruction(instruction, expected):
+    assert model_router.classify(instruction, 100) == expected
+
+
+def test_data_too_large_for_the_fast_model_goes_long_context(monkeypatch):
+    monkeypatch.setitem(config.LLM_RATE_LIMITS, config.GROQ_MODEL, {"rpm": 30, "tpm": 100000})
+    assert model_router.classify("What is the code?", 20000) == "long_context"
+
+
+def test_no_long_context_route_when_it_holds_less_data(monkeypatch):
+    # A tokens-per-minute limit below the fast model's window makes the big window useless
+    monkeypatch.setitem(config.LLM_RATE_LIMITS, config.GROQ_MODEL, {"rpm": 30, "tpm": 5000})
+    assert model_router.classify("What is the code?", 20000) == "extraction"
+
+
+def test_escalation_always_moves_to_the_strong_model():
+    for tokens in (100, 7000, 50000):
+        choice = model_router.route("What is the sum?", tokens, escalate=True)
+        assert choice["model"] == config.STRONG_MODEL
+        assert choice["max_tokens"] >= 1024
+
+
+@pytest.mark.parametrize("query, escalate", [
+    ("Explain the trend in the value column", False),
+    ("What is the value for row_target?", False),
+    ("What is the value for row_target?", True),
+])
+def test_analysis_request_fits_the_routed_model(query, escalate):
+    # About 7k tokens: over the strong model's room once its 2048-token reply is reserved
+    data = "name,value\n" + "\n".join(f"row{i},{i}" for i in range(2500))
+    request = QuizSolver("key")._analysis_request(query, data, escalate)
+    prompt = request["system"] + request["messages"][0]["content"]
+    limit = prompt_builder.prompt_limit(request["model"])
+    assert prompt_builder.count_tokens(prompt) + request["max_tokens"] <= limit
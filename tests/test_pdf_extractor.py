@@ -0,0 +1,35 @@
+"""
+Tests for table detection in PDF text
+"""
+
+import pdf_extractor
+
+PAGE = """Quarterly sales
+Region    Q1     Q2
+North     1,200  1,350
+South     900    1,010
+Subtotal  2,100  2,360
+West      400    380
+Grand Total  2,500  2,740
+Figures in USD."""
+
+
+def test_text_tables_drop_total_rows():
+    assert pdf_extractor._text_tables(PAGE) == [[
+        ["Region", "Q1", "Q2"],
+        ["North", "1,200", "1,350"],
+        ["South", "900", "1,010"],
+        ["West", "400", "380"],
+    ]]
+
+
+def test_total_cell():
+    for cell in ("Total", "TOTALS", "Sub-total", "subtotal", "Sum", "Grand total"):
+        assert pdf_extractor.TOTAL_CELL.match(cell), cell
+    for cell in ("Summary", "Totalitarian", "North"):
+        assert not pdf_extractor.TOTAL_CELL.match(cell), cell
+
+
+def test_table_to_frame_sums_without_the_footer():
+    rows = pdf_extractor._text_tables(PAGE)[0]
+    assert pdf_extractor.table_to_frame(rows)["Q1"].sum() == 2500
@@ -0,0 +1,60 @@
+"""
+Tests for token-budgeted analysis prompts
+"""
+
+import pandas as pd
+import pytest
+
+import config
+import prompt_builder
+from prompt_builder import count_tokens, data_budget, fit_data
+
+
+def test_budget_follows_the_model_window(monkeypatch):
+    monkeypatch.setattr(config, "LLM_RATE_LIMITS", {})
+    monkeypatch.setattr(config, "LLM_DEFAULT_RATE_LIMIT", {"rpm": 30})
+    small = data_budget("llama3-8b-8192", 512)
+    large = data_budget("mixtral-8x7b-32768", 512)
+    assert small == 8192 - 512
+    assert large == config.LLM_PROMPT_TOKEN_BUDGET - 512
+    assert data_budget("unknown-model", 512) == config.MODEL_DEFAULT_CONTEXT_TOKENS - 512
+    assert data_budget("llama3-8b-8192", 512, "x" * 350) == small - 100
+
+
+def test_budget_is_capped_at_tokens_per_minute(monkeypatch):
+    monkeypatch.setattr(config, "LLM_RATE_LIMITS", {"mixtral-8x7b-32768": {"rpm": 30, "tpm": 5000}})
+    assert prompt_builder.prompt_limit("mixtral-8x7b-32768") == 5000
+    assert data_budget("mixtral-8x7b-32768", 2048) == 5000 - 2048
+
+
+def test_small_data_is_unchanged():
+    data = "a,b\n1,2\n"
+    assert fit_data(data, "sum of a", 1000) is data
+
+
+def test_large_table_is_summarised_within_budget():
+    rows = "\n".join(f"row{i},{i},{'north' if i % 2 else 'south'}" for i in range(5000))
+    data = "name,value,region\n" + rows + "\nrow_target,424242,east\n"
+    fitted = fit_data(data, "what is the value of row_target", 800)
+    assert count_tokens(fitted) <= 800
+    assert "row_target,424242,east" in fitted
+    assert "value (int64)" in fitted
+
+
+def test_large_text_keeps_relevant_snippets():
+    filler = "\n".join(f"Paragraph {i} about nothing in particular." for i in range(3000))
+    data = filler + "\nThe secret code is 9137.\n" + filler
+    fitted = fit_data(data, "what is the secret code", 500)
+    assert count_tokens(fitted) <= 500
+    assert "secret code is 9137" in fitted
+
+
+@pytest.mark.parametrize("column, expected", [
+    (pd.Series([True, False, True]), "2 true, 1 false"),
+    (pd.Series([1, None, 3], dtype="Int64"), "sum=4"),
+    (pd.Series([float("nan")] * 3), "mean=nan"),
+    (pd.Series([1 + 2j, 3j]), "(text)"),
+    (pd.Series(["a", "b", "a"]), "most common: a (2)"),
+])
+def test_column_summary_handles_dtypes(column, expected):
+    assert expected in prompt_builder._column_summary("c", column)
@@ -0,0 +1,137 @@
+"""
+Tests for local query plan execution
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import query_engine
+from query_engine import PlanError, execute_plan
+
+
+@pytest.fixture
+def sales():
+    return pd.DataFrame({
+        "Region": ["north", "south", "north", "east", "south", "north"],
+        "Product": ["a", "b", "b", "a", "a", "c"],
+        "Units": [10, 5, 7, 3, 8, 2],
+        "Price": [2.5, 4.0, 4.0, 2.5, 2.5, 10.0],
+    })
+
+
+def test_scalar_aggregate_is_plain_int(sales):
+    result = execute_plan(sales, {"aggregate": {"column": "Units", "func": "sum"}})
+    assert result == 35
+    assert type(result) is int
+
+
+def test_fractional_mean_stays_float(sales):
+    result = execute_plan(sales, {"aggregate": {"column": "Price", "func": "mean"}})
+    assert result == pytest.approx(25.5 / 6)
+
+
+def test_filters_combine(sales):
+    plan = {
+        "filters": [
+            {"column": "Region", "op": "==", "value": "north"},
+            {"column": "Units", "op": ">", "value": "5"},
+        ],
+        "aggregate": {"column": "Units", "func": "sum"},
+    }
+    assert execute_plan(sales, plan) == 17
+
+
+def test_in_and_contains_filters(sales):
+    plan = {"filters": [{"column": "Product", "op": "in", "value": ["a", "c"]}],
+            "aggregate": {"column": "*", "func": "count"}}
+    assert execute_plan(sales, plan) == 4
+    plan = {"filters": [{"column": "Region", "op": "contains", "value": "OUT"}],
+            "aggregate": {"column": "*", "func": "count"}}
+    assert execute_plan(sales, plan) == 2
+
+
+def test_group_by_sorted_and_limited(sales):
+    plan = {
+        "group_by": ["Region"],
+        "aggregate": {"column": "Units", "func": "sum"},
+        "sort": {"column": "Units", "descending": True},
+        "limit": 2,
+    }
+    assert execute_plan(sales, plan) == {"north": 19, "south": 13}
+
+
+def test_column_names_are_matched_loosely(sales):
+    assert execute_plan(sales, {"aggregate": {"column": " units ", "func": "max"}}) == 10
+
+
+def test_select_returns_records(sales):
+    plan = {
+        "filters": [{"column": "Product", "op": "==", "value": "a"}],
+        "sort": {"column": "Units"},
+        "select": ["Region", "Units"],
+    }
+    assert execute_plan(sales, plan) == [
+        {"Region": "east", "Units": 3},
+        {"Region": "south", "Units": 8},
+        {"Region": "north", "Units": 10},
+    ]
+
+
+def test_single_cell_collapses_to_scalar(sales):
+    plan = {"sort": {"column": "Price", "descending": True}, "limit": 1, "select": ["Product"]}
+    assert execute_plan(sales, plan) == "c"
+
+
+def test_unknown_column_raises(sales):
+    with pytest.raises(PlanError):
+        execute_plan(sales, {"aggregate": {"column": "Revenue", "func": "sum"}})
+
+
+def test_unsupported_aggregate_raises(sales):
+    with pytest.raises(PlanError):
+        execute_plan(sales, {"aggregate": {"column": "Units", "func": "product"}})
+
+
+def test_parse_plan_rejects_unsupported():
+    with pytest.raises(PlanError):
+        query_engine.parse_plan('Sure: {"unsupported": true}')
+    assert query_engine.parse_plan('```json\n{"limit": 3}\n```') == {"limit": 3}
+
+
+def test_plan_answer_keeps_the_typed_value():
+    answer = query_engine.PlanAnswer({"north": 19})
+    assert answer.value == {"north": 19}
+    assert str(answer) == '{"north": 19}'
+
+
+@pytest.mark.parametrize("value, expected", [
+    (np.nan, None),
+    (pd.NA, None),
+    (pd.NaT, None),
+    (np.datetime64("NaT", "ns"), None),
+    (pd.Timestamp("2024-03-01 12:30"), "2024-03-01T12:30:00"),
+    (np.datetime64("2024-03-01"), "2024-03-01T00:00:00"),
+    (np.int64(3), 3),
+    (np.float64(2.0), 2),
+])
+def test_to_python(value, expected):
+    assert query_engine._to_python(value) == expected
+
+
+def test_missing_values_and_dates_are_json_ready():
+    df = pd.DataFrame({
+        "Day": pd.to_datetime(["2024-01-02", "2024-01-01", None]),
+        "Units": pd.array([4, None, 1], dtype="Int64"),
+    })
+    records = execute_plan(df, {"select": ["Day", "Units"]})
+    assert records == [
+        {"Day": "2024-01-02T00:00:00", "Units": 4},
+        {"Day": "2024-01-01T00:00:00", "Units": None},
+        {"Day": None, "Units": 1},
+    ]
+    json.dumps(records)
+    by_day = execute_plan(df, {"group_by": ["Day"], "aggregate": {"column": "Units", "func": "sum"}})
+    assert by_day == {"2024-01-01T00:00:00": 0, "2024-01-02T00:00:00": 4}
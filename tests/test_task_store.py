@@ -0,0 +1,126 @@
+"""
+Tests for the task store backends
+"""
+
+import time
+import sqlite3
+
+import pytest
+
+from task_store import MemoryTaskStore, SQLiteTaskStore, TaskStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    """Factory for the backend under test; SQLite stores share one file"""
+    stores = []
+
+    def make(**kwargs):
+        if request.param == "memory":
+            store = MemoryTaskStore(**kwargs)
+        else:
+            store = SQLiteTaskStore(str(tmp_path / "tasks.db"), commit_interval=0.05, **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        TaskStore()
+
+
+def test_lifecycle(make_store):
+    store = make_store()
+    assert store.get("t1") is None
+    assert "t1" not in store
+    store.create("t1")
+    assert store.get("t1") == {"status": "processing", "result": None}
+    store.update("t1", trace={"spans": []})
+    store.set_status("t1", "completed", {"success": True})
+    assert store.get("t1") == {"status": "completed", "result": {"success": True}, "trace": {"spans": []}}
+    assert "t1" in store
+
+
+def test_unknown_task_is_ignored(make_store):
+    store = make_store()
+    assert store.append_log("missing", "line") == -1
+    assert store.logs_since("missing", 3) == ([], 3)
+    store.set_status("missing", "failed")
+    store.update("missing", trace={})
+    assert store.get("missing") is None
+
+
+def test_log_cursor_survives_ring_buffer(make_store):
+    store = make_store(log_lines=3)
+    store.create("t1")
+    indices = [store.append_log("t1", f"line {i}") for i in range(5)]
+    assert indices == [0, 1, 2, 3, 4]
+    assert store.logs_since("t1") == (["line 2", "line 3", "line 4"], 5)
+    assert store.logs_since("t1", 4) == (["line 4"], 5)
+    assert store.logs_since("t1", 5) == ([], 5)
+
+
+def test_recreate_clears_logs(make_store):
+    store = make_store()
+    store.create("t1")
+    store.append_log("t1", "old")
+    store.create("t1")
+    assert store.logs_since("t1") == ([], 0)
+
+
+def test_max_entries_evicts_least_recently_updated(make_store):
+    store = make_store(max_entries=2)
+    for task_id in ("a", "b"):
+        store.create(task_id)
+        time.sleep(0.01)
+    store.append_log("a", "touch")  # "b" is now the stalest
+    time.sleep(0.01)
+    store.create("c")
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+
+
+def test_ttl_expires_tasks(make_store):
+    store = make_store(ttl_seconds=0.05)
+    store.create("t1")
+    time.sleep(0.1)
+    assert store.get("t1") is None
+
+
+def test_sqlite_persists_and_fails_interrupted_tasks(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    store = SQLiteTaskStore(path, commit_interval=60)
+    store.create("done")
+    store.set_status("done", "completed", {"success": True})
+    store.create("running")
+    store.append_log("running", "started")
+    store.close()  # commits what the flusher has not yet
+
+    reopened = SQLiteTaskStore(path)
+    try:
+        assert reopened.get("done") == {"status": "completed", "result": {"success": True}}
+        assert reopened.get("running")["status"] == "failed"
+        assert "restarted" in reopened.get("running")["result"]["error"]
+        assert reopened.logs_since("running") == (["started"], 1)
+    finally:
+        reopened.close()
+
+
+def test_sqlite_commits_in_background(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    store = SQLiteTaskStore(path, commit_interval=0.05)
+    try:
+        store.create("t1")
+        time.sleep(0.3)
+        # A second connection sees only committed data
+        other = sqlite3.connect(path)
+        try:
+            assert other.execute("SELECT status FROM tasks WHERE task_id = 't1'").fetchone() == ("processing",)
+        finally:
+            other.close()
+    finally:
+        store.close()
@@ -0,0 +1,62 @@
+"""
+Tests for the span tree and its context handling
+"""
+
+import asyncio
+
+import pytest
+
+import config
+import tracing
+
+
+@pytest.fixture(autouse=True)
+def sample_everything(monkeypatch):
+    monkeypatch.setattr(config, "TRACE_SAMPLE_RATE", 1.0)
+
+
+def test_spans_nest_under_the_root():
+    trace = tracing.start_trace("t1")
+    try:
+        with tracing.span("hop", attempt=1):
+            with tracing.span("fetch"):
+                pass
+    finally:
+        tracing.finish_trace(trace)
+    spans = trace.to_dict()["spans"]
+    assert spans["name"] == "chain"
+    assert [child["name"] for child in spans["children"]] == ["hop"]
+    assert [child["name"] for child in spans["children"][0]["children"]] == ["fetch"]
+
+
+def test_finish_trace_restores_the_previous_span():
+    outer = tracing.start_trace("outer")
+    inner = tracing.start_trace("inner")
+    tracing.finish_trace(inner)
+    with tracing.span("after"):
+        pass
+    tracing.finish_trace(outer)
+    tracing.finish_trace(outer)  # idempotent
+    assert [child.name for child in outer.root.children] == ["after"]
+    assert inner.root.children == []
+    assert tracing._current_span.get() is None
+    with tracing.span("untraced") as span:
+        assert span is None
+
+
+def test_detached_tasks_attach_to_the_root():
+    async def scenario():
+        trace = tracing.start_trace("t1")
+        try:
+            with tracing.span("hop"):
+                async def background():
+                    with tracing.span("prefetch"):
+                        await asyncio.sleep(0)
+
+                await asyncio.create_task(background(), context=tracing.detached())
+        finally:
+            tracing.finish_trace(trace)
+        return trace
+
+    trace = asyncio.run(scenario())
+    assert [child.name for child in trace.root.children] == ["hop", "prefetch"]
@@ -0,0 +1,138 @@
+"""
+Per-task trace spans (chain -> hop -> stage -> sub-call) with JSON and Chrome exports
+"""
+
+import time
+import random
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+import config
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed operation with attributes and child spans"""
+
+    __slots__ = ("name", "attrs", "start", "end", "error", "children", "trace")
+
+    def __init__(self, name: str, trace: "Trace", attrs: Optional[dict] = None):
+        self.name = name
+        self.trace = trace
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.children = []
+
+    def to_dict(self) -> dict:
+        origin = self.trace.root.start
+        end = self.end if self.end is not None else time.perf_counter()
+        span = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+        }
+        if self.end is None:
+            span["open"] = True
+        if self.attrs:
+            span["attrs"] = self.attrs
+        if self.error:
+            span["error"] = self.error
+        if self.children:
+            span["children"] = [child.to_dict() for child in self.children]
+        return span
+
+
+class Trace:
+    """Span tree for one quiz task"""
+
+    def __init__(self, task_id: str, max_spans: int = config.TRACE_MAX_SPANS):
+        self.task_id = task_id
+        self.max_spans = max_spans
+        self.span_count = 1
+        self.root = Span("chain", self, {"task_id": task_id})
+        self._token = None  # restores the previous current span on finish
+
+    def to_dict(self) -> dict:
+        return {"task_id": self.task_id, "spans": self.root.to_dict()}
+
+
+def to_chrome(trace: dict) -> dict:
+    """Convert a Trace.to_dict() result to Chrome trace-event format
+    (loadable in about:tracing or Perfetto)"""
+    events = []
+
+    def walk(span: dict):
+        args = dict(span.get("attrs", {}))
+        if "error" in span:
+            args["error"] = span["error"]
+        events.append({
+            "name": span["name"],
+            "ph": "X",
+            "ts": span["start_ms"] * 1000,
+            "dur": span["duration_ms"] * 1000,
+            "pid": 1,
+            "tid": 1,
+            "args": args,
+        })
+        for child in span.get("children", []):
+            walk(child)
+
+    walk(trace["spans"])
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"task_id": trace["task_id"]}}
+
+
+def start_trace(task_id: str) -> Optional[Trace]:
+    """Begin a trace for a task if it is sampled, making its root the current
+    span until finish_trace (called from the same context)"""
+    if random.random() >= config.TRACE_SAMPLE_RATE:
+        return None
+    trace = Trace(task_id)
+    trace._token = _current_span.set(trace.root)
+    return trace
+
+
+def finish_trace(trace: Optional[Trace]):
+    """Close the root span of a trace and restore the span that was current before it"""
+    if trace is None:
+        return
+    if trace.root.end is None:
+        trace.root.end = time.perf_counter()
+    if trace._token is not None:
+        token, trace._token = trace._token, None
+        _current_span.reset(token)
+
+
+def detached() -> contextvars.Context:
+    """A copy of the current context rooted at the trace's root span, for
+    starting tasks that outlive the span they are created in"""
+    context = contextvars.copy_context()
+    parent = context.get(_current_span)
+    if parent is not None:
+        context.run(_current_span.set, parent.trace.root)
+    return context
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record a child of the current span; a no-op outside a sampled trace"""
+    parent = _current_span.get()
+    if parent is None or parent.trace.span_count >= parent.trace.max_spans:
+        yield None
+        return
+
+    child = Span(name, parent.trace, attrs)
+    parent.trace.span_count += 1
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)